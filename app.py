@@ -1,5 +1,10 @@
 from flask import Flask, Blueprint
 from extension import mongo
+from indexes import ensure_indexes
+from json_provider import MongoJSONProvider
+from routes.category_counts import start_category_count_reconciler
+from routes.order_archive import start_order_archiver
+from routes.order_images import order_image_snapshots
 from dotenv import load_dotenv
 from routes.user import user_bp
 from routes.product import product_bp
@@ -32,6 +37,12 @@ app.register_blueprint(admin_analytics_bp)
 app.register_blueprint(membership_bp)
 
 mongo.init_app(app)
+# flask_pymongo installs its own provider in init_app, so ours goes after it
+app.json = MongoJSONProvider(app)
+ensure_indexes()
+start_category_count_reconciler()
+start_order_archiver()
+order_image_snapshots.start()
 
 if __name__=="__main__":
     app.run(debug=True, port=8000)
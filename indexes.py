@@ -0,0 +1,34 @@
+from extension import mongo
+from routes.cart import merge_duplicate_carts
+from routes.recommendations import ensure_copurchase_indexes
+
+def ensure_indexes():
+    for key in ["created_at", "sales_count", "price", "name"]:
+        mongo.db.products.create_index([(key, -1), ("_id", -1)])
+        mongo.db.products.create_index([("category_id", 1), (key, -1), ("_id", -1)])
+
+    mongo.db.products.create_index("revision")
+    mongo.db.product_tombstones.create_index("revision")
+    # leases left behind by a crashed writer are already ignored after
+    # REVISION_LEASE_TIMEOUT; this just clears them out
+    mongo.db.revision_leases.create_index("started_at", expireAfterSeconds=3600)
+
+    ensure_copurchase_indexes(mongo.db.copurchase_counts)
+
+    merge_duplicate_carts()
+    mongo.db.carts.create_index("user_id", unique=True)
+
+    mongo.db.orders.create_index([("created_at", -1), ("_id", -1)])
+    mongo.db.orders.create_index([("status", 1), ("created_at", -1), ("_id", -1)])
+    mongo.db.orders.create_index([("items.category", 1), ("created_at", -1), ("_id", -1)])
+    mongo.db.orders.create_index("user_id")
+    mongo.db.orders.create_index([("status", 1), ("status_updated_at", 1)])
+
+    # the archive answers the same listings and per-product history reads
+    mongo.db.orders_archive.create_index([("created_at", -1), ("_id", -1)])
+    mongo.db.orders_archive.create_index([("status", 1), ("created_at", -1), ("_id", -1)])
+    mongo.db.orders_archive.create_index([("items.category", 1), ("created_at", -1), ("_id", -1)])
+    mongo.db.orders_archive.create_index("user_id")
+    mongo.db.orders_archive.create_index("items.product_id")
+
+    mongo.db.order_image_jobs.create_index("source_url")
@@ -0,0 +1,47 @@
+from flask.json.provider import DefaultJSONProvider
+from bson import ObjectId, Decimal128
+from datetime import datetime, date
+
+LARGE_RESPONSE_ITEMS = 200
+
+def _default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+
+    if isinstance(o, Decimal128):
+        return float(o.to_decimal())
+
+    return DefaultJSONProvider.default(o)
+
+def _is_large(obj):
+    if isinstance(obj, list):
+        return len(obj) >= LARGE_RESPONSE_ITEMS
+
+    if isinstance(obj, dict):
+        return any(
+            isinstance(value, list) and len(value) >= LARGE_RESPONSE_ITEMS
+            for value in obj.values()
+        )
+
+    return False
+
+class MongoJSONProvider(DefaultJSONProvider):
+    # encodes ObjectId, datetime and Decimal128 inline, so routes can hand
+    # documents straight to jsonify without converting them first
+    default = staticmethod(_default)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+
+        # big listings skip key sorting and debug indentation; indenting
+        # drops json to its pure-Python encoder
+        if not _is_large(obj):
+            return super().response(obj)
+
+        return self._app.response_class(
+            f"{self.dumps(obj, sort_keys=False, separators=(',', ':'))}\n",
+            mimetype=self.mimetype
+        )
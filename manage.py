@@ -0,0 +1,48 @@
+from flask import Flask
+from dotenv import load_dotenv
+from extension import mongo
+import argparse
+import logging
+import os
+
+logger = logging.getLogger("manage")
+
+def create_maintenance_app():
+    # only the Mongo connection; importing app.py would also start the
+    # background workers
+    load_dotenv()
+
+    app = Flask(__name__)
+    app.config["MONGO_URI"] = os.getenv("MONGO_URI")
+    mongo.init_app(app)
+
+    return app
+
+def archive_orders_command():
+    from routes.order_archive import archive_orders
+
+    logger.info("Archived %s orders", archive_orders())
+
+def rebuild_recommendations_command():
+    from routes.recommendations import rebuild_recommendations
+
+    rebuild_recommendations()
+    logger.info("Rebuilt recommendations")
+
+COMMANDS = {
+    "archive-orders": archive_orders_command,
+    "rebuild-recommendations": rebuild_recommendations_command
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
+    with create_maintenance_app().app_context():
+        COMMANDS[args.command]()
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 from flask import Blueprint, jsonify, request
-from extension import mongo
 from utils import login_required
 from routes.utils import parse_date_range
+from routes.order_archive import aggregate_orders, spans_archive
 from datetime import datetime
 
 admin_analytics_bp = Blueprint("admin_analytics", __name__, url_prefix="/api/admin")
 
+def _aggregate_orders(pipeline, match_stage=None):
+    # archived orders are only read when the range reaches back past the cutoff
+    start = match_stage["$match"]["created_at"]["$gte"] if match_stage else None
+    return list(aggregate_orders(pipeline, history=spans_archive(start=start)))
+
 @admin_analytics_bp.route("/summary", methods=["GET"])
 @login_required(role="admin")
 def get_summary():
@@ -43,7 +48,7 @@ def get_summary():
         }
     ]
 
-    net_result = list(mongo.db.orders.aggregate(net_pipeline))
+    net_result = _aggregate_orders(net_pipeline, match_stage)
     net_data = net_result[0] if net_result else {
         "net_revenue": 0,
         "sold_items": 0,
@@ -73,7 +78,7 @@ def get_summary():
         {"$project": {"_id": 0, "gross_revenue": 1}}
     ]
 
-    gross_result = list(mongo.db.orders.aggregate(gross_pipeline))
+    gross_result = _aggregate_orders(gross_pipeline, match_stage)
     gross_revenue = gross_result[0]["gross_revenue"] if gross_result else 0
 
     return jsonify({
@@ -99,7 +104,10 @@ def revenue_growth():
     prev_start = start_dt - range_duration
     prev_end = start_dt
 
+    range_stage = {"$match": {"created_at": {"$gte": prev_start, "$lte": end_dt}}}
+
     pipeline = [
+        range_stage,
         {"$match": {"status": "Delivered"}},
         {"$unwind": "$items"},
         {
@@ -115,7 +123,7 @@ def revenue_growth():
         }
     ]
 
-    data = list(mongo.db.orders.aggregate(pipeline))
+    data = _aggregate_orders(pipeline, range_stage)
 
     current = sum(
         d["amount"]
@@ -173,7 +181,7 @@ def sales_trend():
         {"$sort": {"_id": 1}}
     ]
 
-    data = list(mongo.db.orders.aggregate(pipeline))
+    data = _aggregate_orders(pipeline, match_stage)
 
     return jsonify([
         {"date": d["_id"], "revenue": d["revenue"]}
@@ -202,7 +210,7 @@ def top_products():
         {"$limit": 5}
     ]
 
-    data = list(mongo.db.orders.aggregate(pipeline))
+    data = _aggregate_orders(pipeline, match_stage)
 
     return jsonify([
         {"name": d["_id"], "qty": d["qty"]}
@@ -255,7 +263,7 @@ def category_revenue():
         {"$sort": {"revenue": -1}}
     ]
 
-    data = list(mongo.db.orders.aggregate(pipeline))
+    data = _aggregate_orders(pipeline, match_stage)
 
     return jsonify([
         {"category": d["_id"], "revenue": d["revenue"]}
@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta
+from bisect import bisect_right
+from extension import mongo
+from routes.versions import read_version
+import threading
+import time
+
+CAMPAIGN_INDEX_TTL = 30
+CAMPAIGN_HISTORY = timedelta(hours=1)
+
+PRIORITY_ORDER = {"HIGH": 1, "MEDIUM": 2, "LOW": 3}
+
+CAMPAIGN_FIELDS = {
+    "product_id": 1,
+    "priority": 1,
+    "discount_percent": 1,
+    "title": 1,
+    "start": 1,
+    "end": 1
+}
+
+class CampaignIndex:
+    # live, upcoming and recently ended campaigns per product, sorted by
+    # start; reloaded every `ttl` seconds, or as soon as a request sees a
+    # newer shared campaign version, so writes from other workers converge
+    def __init__(self, ttl=CAMPAIGN_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_product = {}
+        self._loaded_at = None
+        self._version = None
+
+    def refresh(self, version=None):
+        # the version is read before the scan, so the index holds at least
+        # every campaign written up to it
+        if version is None:
+            version = read_version("campaign")
+
+        now = datetime.utcnow()
+        by_product = {}
+
+        for campaign in mongo.db.campaigns.find({"end": {"$gte": now - CAMPAIGN_HISTORY}}, CAMPAIGN_FIELDS):
+            by_product.setdefault(campaign["product_id"], []).append(campaign)
+
+        for campaigns in by_product.values():
+            campaigns.sort(key=lambda c: c["start"])
+
+        with self._lock:
+            self._by_product = by_product
+            self._loaded_at = time.monotonic()
+            self._version = version
+
+    def _ensure_fresh(self):
+        loaded_at = self._loaded_at
+
+        if loaded_at is None or time.monotonic() - loaded_at > self.ttl:
+            self.refresh()
+
+    def ensure_version(self, version):
+        loaded = self._version
+
+        if loaded is None or version > loaded:
+            self.refresh(version)
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def upsert(self, campaign):
+        if self._loaded_at is None:
+            return
+
+        product_id = campaign["product_id"]
+
+        with self._lock:
+            campaigns = [
+                c for c in self._by_product.get(product_id, [])
+                if c["_id"] != campaign["_id"]
+            ]
+
+            if campaign["end"] >= datetime.utcnow() - CAMPAIGN_HISTORY:
+                campaigns.append(campaign)
+                campaigns.sort(key=lambda c: c["start"])
+
+            by_product = dict(self._by_product)
+
+            if campaigns:
+                by_product[product_id] = campaigns
+            else:
+                by_product.pop(product_id, None)
+
+            self._by_product = by_product
+
+    def effective(self, product_id, now, early_hours=0):
+        # overlapping campaigns resolve by priority, then by the latest start
+        self._ensure_fresh()
+
+        campaigns = self._by_product.get(product_id)
+        if not campaigns:
+            return None
+
+        visible_until = now + timedelta(hours=early_hours) if early_hours > 0 else now
+        upper = bisect_right([c["start"] for c in campaigns], visible_until)
+
+        best = None
+
+        for campaign in campaigns[:upper]:
+            if campaign["end"] < now:
+                continue
+
+            if best is None or _rank(campaign) <= _rank(best):
+                best = campaign
+
+        return best
+
+    def visible(self, now, early_hours=0):
+        self._ensure_fresh()
+
+        result = {}
+
+        for product_id in list(self._by_product):
+            campaign = self.effective(product_id, now, early_hours)
+            if campaign:
+                result[product_id] = campaign
+
+        return result
+
+    def flipped(self, since, now, early_hours=0):
+        self._ensure_fresh()
+
+        changed = []
+
+        for product_id in list(self._by_product):
+            before = self.effective(product_id, since, early_hours)
+            after = self.effective(product_id, now, early_hours)
+
+            if (before or {}).get("_id") != (after or {}).get("_id"):
+                changed.append(product_id)
+
+        return changed
+
+    def last_boundary(self, now, early_hours=0):
+        self._ensure_fresh()
+
+        latest = None
+
+        for campaigns in list(self._by_product.values()):
+            for campaign in campaigns:
+                points = [campaign["start"], campaign["end"]]
+
+                if early_hours > 0:
+                    points.append(campaign["start"] - timedelta(hours=early_hours))
+
+                for point in points:
+                    if point <= now and (latest is None or point > latest):
+                        latest = point
+
+        return latest
+
+    def next_boundary(self, now, early_hours=0):
+        self._ensure_fresh()
+
+        upcoming = None
+
+        for campaigns in list(self._by_product.values()):
+            for campaign in campaigns:
+                points = [campaign["start"], campaign["end"]]
+
+                if early_hours > 0:
+                    points.append(campaign["start"] - timedelta(hours=early_hours))
+
+                for point in points:
+                    if point > now and (upcoming is None or point < upcoming):
+                        upcoming = point
+
+        return upcoming
+
+def _rank(campaign):
+    return PRIORITY_ORDER.get(campaign.get("priority"), 4)
+
+campaign_index = CampaignIndex()
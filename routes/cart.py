@@ -1,87 +1,143 @@
 from flask import Blueprint, session, request, jsonify
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from extension import mongo
-from utils import login_required
-from routes.utils import apply_campaign_discount
+from utils import login_required, get_user_context
+from routes.utils import apply_campaign_discounts, cart_line, cart_totals
 
 cart_bp = Blueprint("cart", __name__, url_prefix="/api/cart")
 
+CART_BATCH_OPS = {"add", "set", "remove"}
+MAX_CART_BATCH = 100
+CART_BATCH_RETRIES = 3
+
+CART_PRODUCT_FIELDS = {
+    "name": 1,
+    "price": 1,
+    "quantity": 1,
+    "image_url": 1
+}
+
 @cart_bp.route("/add", methods=["POST"])
 @login_required()
 def add_to_cart():
     data = request.get_json()
     product_id = data.get("product_id")
-    qty = int(data.get("qty", 1))
 
-    product = mongo.db.products.find_one({"_id": ObjectId(product_id)})
+    try:
+        qty = int(data.get("qty", 1))
+    except (TypeError, ValueError):
+        qty = 0
+
+    if not product_id or qty < 1:
+        return jsonify({"error": "Invalid quantity"}), 400
+
+    product = mongo.db.products.find_one({"_id": ObjectId(product_id)}, {"quantity": 1})
     if not product or product.get("quantity", 0) <= 0:
         return jsonify({"error": "Out of stock"}), 400
 
     stock = product.get("quantity", 0)
     user_id = ObjectId(session.get("user_id"))
 
-    cart = mongo.db.carts.find_one({"user_id": user_id})
+    new_qty = _add_item(user_id, product["_id"], qty, stock)
 
-    if not cart:
-        qty = min(qty, stock)
+    return jsonify({
+        "product_id": product_id,
+        "qty": new_qty,
+        "stock": stock
+    }), 200
 
-        mongo.db.carts.insert_one({
+def merge_duplicate_carts():
+    # older writes could create a second cart for the same user; fold those
+    # into one before the unique user_id index is built
+    duplicates = mongo.db.carts.aggregate([
+        {"$group": {"_id": "$user_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ])
+
+    for group in duplicates:
+        carts = list(mongo.db.carts.find({"_id": {"$in": group["ids"]}}).sort("_id", 1))
+        qty_by_product = {}
+
+        for cart in carts:
+            for item in cart.get("items", []):
+                qty_by_product[item["product_id"]] = qty_by_product.get(item["product_id"], 0) + item["qty"]
+
+        mongo.db.carts.update_one(
+            {"_id": carts[0]["_id"]},
+            {"$set": {"items": [
+                {"product_id": product_id, "qty": qty}
+                for product_id, qty in qty_by_product.items()
+            ]}}
+        )
+        mongo.db.carts.delete_many({"_id": {"$in": [c["_id"] for c in carts[1:]]}})
+
+def _line_qty(cart):
+    return cart["items"][0]["qty"] if cart and cart.get("items") else 0
+
+def _add_item(user_id, product_id, qty, stock):
+    # each step is one atomic write on the cart document; later steps only
+    # run when the earlier filter did not match
+    cart = mongo.db.carts.find_one_and_update(
+        {
             "user_id": user_id,
-            "items": [{"product_id": ObjectId(product_id), "qty": qty}]
-        })
-
-        return jsonify({
-            "product_id": product_id,
-            "qty": qty,
-            "stock": stock
-        }), 200
-
-    items = cart.get("items", [])
-    found = False
-
-    for item in items:
-        if item["product_id"] == ObjectId(product_id):
-            item["qty"] = min(item["qty"] + qty, stock)
-            new_qty = item["qty"]
-            found = True
-            break
-
-    if not found:
-        new_qty = min(qty, stock)
-        items.append({"product_id": ObjectId(product_id), "qty": new_qty})
+            "items": {"$elemMatch": {"product_id": product_id, "qty": {"$lte": stock - qty}}}
+        },
+        {"$inc": {"items.$.qty": qty}},
+        projection={"items": {"$elemMatch": {"product_id": product_id}}},
+        return_document=ReturnDocument.AFTER
+    )
+    if cart:
+        return _line_qty(cart)
+
+    try:
+        mongo.db.carts.update_one(
+            {"user_id": user_id, "items.product_id": {"$ne": product_id}},
+            {"$push": {"items": {"product_id": product_id, "qty": min(qty, stock)}}},
+            upsert=True
+        )
+        return min(qty, stock)
+    except DuplicateKeyError:
+        # the line already exists and the increment would pass stock
+        pass
 
     mongo.db.carts.update_one(
-        {"user_id": user_id},
-        {"$set": {"items": items}}
+        {"user_id": user_id, "items.product_id": product_id},
+        {"$set": {"items.$.qty": stock}}
     )
 
-    return jsonify({
-        "product_id": product_id,
-        "qty": new_qty,
-        "stock": stock
-    }), 200
+    return stock
 
 @cart_bp.route("/", methods=["GET"])
 @login_required()
 def get_cart():
-    user_id = ObjectId(session.get("user_id"))
-    cart = mongo.db.carts.find_one({"user_id": user_id})
+    user = get_user_context()
+    cart = mongo.db.carts.find_one({"user_id": user.user_id})
+
+    return _cart_response(user, cart.get("items", []) if cart else [])
 
-    if not cart:
-        return jsonify({"items": []}), 200
+def _cart_response(user, cart_items):
+    products = mongo.db.products.find(
+        {"_id": {"$in": [item["product_id"] for item in cart_items]}},
+        CART_PRODUCT_FIELDS
+    ) if cart_items else []
+    products_by_id = {p["_id"]: p for p in apply_campaign_discounts(list(products))}
 
     items = []
+    lines = []
 
-    for item in cart.get("items", []):
-        product_id = str(item["product_id"])
+    for item in cart_items:
         qty = item["qty"]
 
-        product = mongo.db.products.find_one({"_id": ObjectId(product_id)})
+        product = products_by_id.get(item["product_id"])
         if product:
-            product = apply_campaign_discount(product)
+            line = cart_line(product, qty)
+            lines.append(line)
 
             items.append({
-                "product_id": product_id,
+                "product_id": item["product_id"],
                 "name": product["name"],
                 "price": product.get("price"),
                 "offer_price": product.get("offer_price"),
@@ -92,28 +148,96 @@ def get_cart():
                 "membership_plan": product.get("membership_plan"),
                 "qty": qty,
                 "stock": product.get("quantity", 0),
-                "image_url": product.get("image_url")
+                "image_url": product.get("image_url"),
+                **line
             })
 
-    original_shipping_cost = 1000
-    shipping_cost = original_shipping_cost
+    return jsonify({
+        "items": items,
+        **cart_totals(lines, user.free_shipping)
+    }), 200
+
+@cart_bp.route("/batch", methods=["POST"])
+@login_required()
+def batch_cart():
+    data = request.get_json() or {}
+    operations = data.get("operations")
+
+    if not isinstance(operations, list) or not operations or len(operations) > MAX_CART_BATCH:
+        return jsonify({"error": "Invalid operations"}), 400
+
+    parsed = []
+
+    try:
+        for op in operations:
+            kind = op["op"]
+            qty = int(op.get("qty", 1 if kind == "add" else 0))
+
+            if kind not in CART_BATCH_OPS or (kind != "remove" and qty < 1):
+                raise ValueError
+
+            parsed.append((kind, ObjectId(str(op["product_id"])), qty))
+    except (KeyError, TypeError, ValueError, InvalidId):
+        return jsonify({"error": "Invalid operations"}), 400
+
+    # one stock read covers every product the batch touches
+    stock = {
+        p["_id"]: p.get("quantity", 0)
+        for p in mongo.db.products.find(
+            {"_id": {"$in": list({product_id for _, product_id, _ in parsed})}},
+            {"quantity": 1}
+        )
+    }
+
+    unavailable = list(dict.fromkeys(
+        product_id for kind, product_id, _ in parsed
+        if kind != "remove" and stock.get(product_id, 0) <= 0
+    ))
+    if unavailable:
+        return jsonify({"error": "Out of stock", "product_ids": unavailable}), 400
+
+    user = get_user_context()
+
+    # the cart is replaced only if it still holds what we read, so a
+    # concurrent mutation makes us recompute instead of being overwritten
+    for _ in range(CART_BATCH_RETRIES):
+        cart = mongo.db.carts.find_one({"user_id": user.user_id}, {"items": 1})
+        current = cart.get("items", []) if cart else []
+        items = _apply_cart_operations(current, parsed, stock)
+
+        if cart is None:
+            try:
+                mongo.db.carts.insert_one({"user_id": user.user_id, "items": items})
+                break
+            except DuplicateKeyError:
+                continue
+
+        result = mongo.db.carts.update_one(
+            {"_id": cart["_id"], "items": current},
+            {"$set": {"items": items}}
+        )
+        if result.matched_count:
+            break
+    else:
+        return jsonify({"error": "Cart changed, please retry"}), 409
 
-    user = mongo.db.users.find_one({"_id": user_id})
-    membership = user.get("membership") if user else None
+    return _cart_response(user, items)
 
-    from datetime import datetime
-    now = datetime.utcnow()
+def _apply_cart_operations(items, operations, stock):
+    qty_by_product = {item["product_id"]: item["qty"] for item in items}
 
-    if membership:
-        expiry = membership.get("expires_at")
-        if expiry and expiry > now and membership.get("free_shipping"):
-            shipping_cost = 0
+    for kind, product_id, qty in operations:
+        if kind == "remove":
+            qty_by_product.pop(product_id, None)
+        elif kind == "add":
+            qty_by_product[product_id] = min(qty_by_product.get(product_id, 0) + qty, stock[product_id])
+        else:
+            qty_by_product[product_id] = min(qty, stock[product_id])
 
-    return jsonify({
-        "items": items,
-        "shipping_cost": shipping_cost,
-        "original_shipping_cost": original_shipping_cost
-    }), 200
+    return [
+        {"product_id": product_id, "qty": qty}
+        for product_id, qty in qty_by_product.items()
+    ]
 
 @cart_bp.route("/update", methods=["PUT"])
 @login_required()
@@ -155,29 +279,29 @@ def update_cart_qty():
 def decrease_qty(product_id):
     user_id = ObjectId(session.get("user_id"))
 
-    cart = mongo.db.carts.find_one({"user_id": user_id})
-    if not cart:
-        return jsonify({"message": "Cart not found"}), 404
-
-    items = cart.get("items", [])
-    updated_items = []
-
-    new_qty = 0
-
-    for item in items:
-        if str(item["product_id"]) == product_id:
-            if item["qty"] > 1:
-                item["qty"] -= 1
-                new_qty = item["qty"]
-                updated_items.append(item)
-        else:
-            updated_items.append(item)
-
-    mongo.db.carts.update_one(
-        {"user_id": user_id},
-        {"$set": {"items": updated_items}}
+    cart = mongo.db.carts.find_one_and_update(
+        {
+            "user_id": user_id,
+            "items": {"$elemMatch": {"product_id": ObjectId(product_id), "qty": {"$gt": 1}}}
+        },
+        {"$inc": {"items.$.qty": -1}},
+        projection={"items": {"$elemMatch": {"product_id": ObjectId(product_id)}}},
+        return_document=ReturnDocument.AFTER
     )
 
+    if cart:
+        new_qty = _line_qty(cart)
+    else:
+        # the last unit leaves the cart with the line itself
+        result = mongo.db.carts.update_one(
+            {"user_id": user_id},
+            {"$pull": {"items": {"product_id": ObjectId(product_id), "qty": {"$lte": 1}}}}
+        )
+        if result.matched_count == 0:
+            return jsonify({"message": "Cart not found"}), 404
+
+        new_qty = 0
+
     return jsonify({
         "product_id": product_id,
         "qty": new_qty
@@ -2,6 +2,11 @@ from flask import Blueprint, request, jsonify
 from utils import login_required
 from bson.objectid import ObjectId
 from extension import mongo
+from routes.search_index import product_search_index
+from routes.category_cache import category_cache
+from routes.order_archive import find_orders
+from routes.versions import product_revision
+from datetime import datetime
 
 category_bp = Blueprint("categories", __name__, url_prefix="/api/categories")
 
@@ -26,11 +31,13 @@ def add_category():
     category = {
         "name": normalized_name,
         "spec_names": spec_names,
-        "detail_titles": detail_titles
+        "detail_titles": detail_titles,
+        "product_count": 0,
+        "in_stock_count": 0
     }
 
-    result = mongo.db.category.insert_one(category)
-    category["_id"] = str(result.inserted_id)
+    mongo.db.category.insert_one(category)
+    category_cache.invalidate()
 
     return jsonify(category), 201
 
@@ -41,7 +48,6 @@ def get_single_category(category_id):
     if not category:
         return jsonify({"message": "Category not found"}), 404
 
-    category["_id"] = str(category["_id"])
     return jsonify(category), 200
 
 @category_bp.route("/<category_id>/template", methods=["GET"])
@@ -61,7 +67,7 @@ def get_categories():
     categories = []
     for c in mongo.db.category.find():
         categories.append({
-            "id": str(c["_id"]),
+            "id": c["_id"],
             "name": c["name"]
         })
     return jsonify(categories), 200
@@ -83,7 +89,7 @@ def category_summary(category_id):
     revenue = 0
 
     if product_ids:
-        orders_cursor = mongo.db.orders.find({
+        orders_cursor = find_orders({
             "items.product_id": {"$in": product_ids}
         })
 
@@ -122,26 +128,17 @@ def category_summary(category_id):
 
 @category_bp.route("/with-count", methods=["GET"])
 def get_categories_with_count():
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "products",
-                "localField": "_id",
-                "foreignField": "category_id",
-                "as": "products"
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "id": {"$toString": "$_id"},
-                "name": 1,
-                "count": {"$size": "$products"}
-            }
-        }
-    ]
+    # counts are kept on the category documents by the product write paths
+    result = []
+
+    for c in mongo.db.category.find({}, {"name": 1, "product_count": 1, "in_stock_count": 1}):
+        result.append({
+            "id": c["_id"],
+            "name": c["name"],
+            "count": c.get("product_count", 0),
+            "in_stock": c.get("in_stock_count", 0)
+        })
 
-    result = list(mongo.db.category.aggregate(pipeline))
     return jsonify(result), 200
 
 @category_bp.route("/update/<category_id>", methods=["PUT"])
@@ -177,50 +174,56 @@ def update_category(category_id):
     )
 
     products = mongo.db.products.find({"category_id": ObjectId(category_id)})
-
-    for product in products:
-        old_specs = product.get("specs", [])
-        old_details = product.get("details", [])
-
-        new_specs = []
-        new_details = []
-
-        for i, spec_name in enumerate(spec_names):
-            value = ""
-            if i < len(old_specs):
-                value = old_specs[i].get("value", "")
-
-            new_specs.append({
-                "name": spec_name,
-                "value": value,
-                "is_default": True
-            })
-
-        for i, title in enumerate(detail_titles):
-            content = []
-            if i < len(old_details):
-                content = old_details[i].get("content", [])
-
-            new_details.append({
-                "title": title,
-                "content": content,
-                "is_default": True
-            })
-
-        mongo.db.products.update_one(
-            {"_id": product["_id"]},
-            {
-                "$set": {
-                    "specs": new_specs,
-                    "details": new_details
+    now = datetime.utcnow()
+
+    with product_revision() as revision:
+        for product in products:
+            old_specs = product.get("specs", [])
+            old_details = product.get("details", [])
+
+            new_specs = []
+            new_details = []
+
+            for i, spec_name in enumerate(spec_names):
+                value = ""
+                if i < len(old_specs):
+                    value = old_specs[i].get("value", "")
+
+                new_specs.append({
+                    "name": spec_name,
+                    "value": value,
+                    "is_default": True
+                })
+
+            for i, title in enumerate(detail_titles):
+                content = []
+                if i < len(old_details):
+                    content = old_details[i].get("content", [])
+
+                new_details.append({
+                    "title": title,
+                    "content": content,
+                    "is_default": True
+                })
+
+            mongo.db.products.update_one(
+                {"_id": product["_id"]},
+                {
+                    "$set": {
+                        "specs": new_specs,
+                        "details": new_details,
+                        "updated_at": now,
+                        "revision": revision
+                    }
                 }
-            }
-        )
+            )
+
+    category_cache.invalidate()
+    product_search_index.invalidate()
 
     updated = mongo.db.category.find_one({"_id": ObjectId(category_id)})
     if not updated:
         return jsonify({"message": "Category not found"}), 404
-    updated["_id"] = str(updated["_id"])
 
     return jsonify(updated), 200
 
@@ -237,6 +240,6 @@ def delete_category(category_id):
         return jsonify({"message": "Category in use"}), 400
 
     mongo.db.category.delete_one({"_id": ObjectId(category_id)})
-    category["_id"] = str(category["_id"])
+    category_cache.invalidate()
 
     return jsonify(category), 200
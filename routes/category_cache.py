@@ -0,0 +1,74 @@
+from extension import mongo
+from routes.versions import read_version, bump_version
+import threading
+import time
+
+CATEGORY_VERSION_CHECK_INTERVAL = 5
+
+CATEGORY_FIELDS = {
+    "name": 1,
+    "spec_names": 1,
+    "detail_titles": 1
+}
+
+class CategoryCache:
+    # id -> category document; the shared version stamp is re-read at most
+    # every few seconds and a mismatch reloads the whole (small) collection
+    def __init__(self, check_interval=CATEGORY_VERSION_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._categories = None
+        self._version = None
+        self._checked_at = 0
+
+    def _load(self, version):
+        categories = {
+            c["_id"]: c
+            for c in mongo.db.category.find({}, CATEGORY_FIELDS)
+        }
+
+        with self._lock:
+            self._categories = categories
+            self._version = version
+            self._checked_at = time.monotonic()
+
+        return categories
+
+    def _ensure_fresh(self):
+        with self._lock:
+            categories = self._categories
+            checked_at = self._checked_at
+            current = self._version
+
+        if categories is not None and time.monotonic() - checked_at < self.check_interval:
+            return categories
+
+        version = read_version("category")
+
+        if categories is None or version != current:
+            return self._load(version)
+
+        with self._lock:
+            self._checked_at = time.monotonic()
+
+        return categories
+
+    def invalidate(self):
+        # the loaded map is never dropped, so readers always have one; the
+        # next read just skips the interval and picks up the new version
+        bump_version("category")
+
+        with self._lock:
+            self._checked_at = 0
+
+    def all(self):
+        return self._ensure_fresh()
+
+    def get(self, category_id):
+        return self.all().get(category_id)
+
+    def name(self, category_id, default=""):
+        category = self.get(category_id)
+        return category["name"] if category else default
+
+category_cache = CategoryCache()
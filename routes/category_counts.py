@@ -0,0 +1,81 @@
+from extension import mongo
+from pymongo import UpdateOne
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_COUNT_RECONCILE_INTERVAL = 600
+
+def _in_stock(quantity):
+    return 1 if (quantity or 0) > 0 else 0
+
+def adjust_category_counts(category_id, total=0, in_stock=0):
+    if not category_id or (not total and not in_stock):
+        return
+
+    mongo.db.category.update_one(
+        {"_id": category_id},
+        {"$inc": {"product_count": total, "in_stock_count": in_stock}}
+    )
+
+def count_product_added(product):
+    adjust_category_counts(product.get("category_id"), 1, _in_stock(product.get("quantity")))
+
+def count_product_removed(product):
+    adjust_category_counts(product.get("category_id"), -1, -_in_stock(product.get("quantity")))
+
+def count_product_moved(product, new_category_id):
+    if product.get("category_id") == new_category_id:
+        return
+
+    count_product_removed(product)
+    count_product_added({**product, "category_id": new_category_id})
+
+def count_stock_change(category_id, old_qty, new_qty):
+    adjust_category_counts(category_id, in_stock=_in_stock(new_qty) - _in_stock(old_qty))
+
+def reconcile_category_counts():
+    # the incremental counters can drift when writes race each other, so
+    # they are periodically recomputed from the products themselves
+    counts = {
+        row["_id"]: row
+        for row in mongo.db.products.aggregate([
+            {
+                "$group": {
+                    "_id": "$category_id",
+                    "total": {"$sum": 1},
+                    "in_stock": {"$sum": {"$cond": [{"$gt": ["$quantity", 0]}, 1, 0]}}
+                }
+            }
+        ])
+    }
+
+    updates = []
+
+    for category in mongo.db.category.find({}, {"_id": 1}):
+        row = counts.get(category["_id"], {})
+
+        updates.append(UpdateOne(
+            {"_id": category["_id"]},
+            {"$set": {
+                "product_count": row.get("total", 0),
+                "in_stock_count": row.get("in_stock", 0)
+            }}
+        ))
+
+    if updates:
+        mongo.db.category.bulk_write(updates, ordered=False)
+
+def _reconcile_loop(interval):
+    while True:
+        try:
+            reconcile_category_counts()
+        except Exception:
+            logger.exception("Category count reconciliation failed")
+
+        time.sleep(interval)
+
+def start_category_count_reconciler(interval=CATEGORY_COUNT_RECONCILE_INTERVAL):
+    threading.Thread(target=_reconcile_loop, args=(interval,), daemon=True).start()
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+import threading
+
+FEED_CACHE_MAX_TTL = 60
+FEED_CACHE_WAIT_TIMEOUT = 10
+
+class FeedCache:
+    # computed home-page feeds keyed by (feed, membership tier); an entry is
+    # valid until its expiry and only for the catalog versions it was built
+    # from, and concurrent misses on one key share a single computation
+    def __init__(self, max_ttl=FEED_CACHE_MAX_TTL):
+        self.max_ttl = max_ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._inflight = {}
+
+    def _lookup(self, key, version, now):
+        entry = self._entries.get(key)
+
+        if entry and entry["version"] == version and entry["expires_at"] > now:
+            return entry
+
+        return None
+
+    def get(self, key, version, expires_at, compute):
+        now = datetime.utcnow()
+        expires_at = min(
+            expires_at or datetime.max,
+            now + timedelta(seconds=self.max_ttl)
+        )
+
+        with self._lock:
+            entry = self._lookup(key, version, now)
+            if entry:
+                return entry["value"]
+
+            event = self._inflight.get(key)
+            leader = event is None
+
+            if leader:
+                event = self._inflight[key] = threading.Event()
+
+        if not leader:
+            event.wait(FEED_CACHE_WAIT_TIMEOUT)
+
+            with self._lock:
+                entry = self._lookup(key, version, datetime.utcnow())
+
+            return entry["value"] if entry else compute()
+
+        try:
+            value = compute()
+
+            with self._lock:
+                self._entries[key] = {
+                    "value": value,
+                    "version": version,
+                    "expires_at": expires_at
+                }
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+            event.set()
+
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+feed_cache = FeedCache()
@@ -41,6 +41,6 @@ def buy_membership():
     return jsonify({
         "success": True,
         "plan": plan,
-        "purchased_at": now.isoformat(),
-        "expires_at": expiry.isoformat()
+        "purchased_at": now,
+        "expires_at": expiry
     })
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+from itertools import chain
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+from extension import mongo
+import heapq
+import logging
+import threading
+import time
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", "90"))
+ORDER_ARCHIVE_INTERVAL = 3600
+ORDER_ARCHIVE_BATCH = 500
+
+ORDER_ARCHIVER_LEASE = "order_archiver"
+
+TERMINAL_STATUSES = ["Delivered", "Rejected", "Cancelled"]
+
+def archive_cutoff(now=None):
+    return (now or datetime.utcnow()) - timedelta(days=ORDER_ARCHIVE_AFTER_DAYS)
+
+def spans_archive(status=None, start=None):
+    # only terminal orders whose last change is older than the cutoff are
+    # moved, so newer or still-open orders never need the archive
+    if status and status not in TERMINAL_STATUSES:
+        return False
+
+    return start is None or start < archive_cutoff()
+
+def archive_orders(now=None):
+    cutoff = archive_cutoff(now)
+    query = {
+        "status": {"$in": TERMINAL_STATUSES},
+        "$or": [
+            {"status_updated_at": {"$lt": cutoff}},
+            {"status_updated_at": {"$exists": False}, "created_at": {"$lt": cutoff}}
+        ]
+    }
+
+    moved = 0
+
+    while True:
+        batch = list(mongo.db.orders.find(query).limit(ORDER_ARCHIVE_BATCH))
+        if not batch:
+            return moved
+
+        # copy first, then delete: a crash in between leaves the orders in
+        # both collections and the next run finishes the move
+        mongo.db.orders_archive.bulk_write([
+            ReplaceOne({"_id": o["_id"]}, o, upsert=True)
+            for o in batch
+        ], ordered=False)
+
+        moved += mongo.db.orders.delete_many({
+            "_id": {"$in": [o["_id"] for o in batch]},
+            "status": {"$in": TERMINAL_STATUSES}
+        }).deleted_count
+
+        if len(batch) < ORDER_ARCHIVE_BATCH:
+            return moved
+
+def find_orders(query, projection=None, history=True):
+    hot = mongo.db.orders.find(query, projection)
+
+    if not history:
+        return hot
+
+    return chain(mongo.db.orders_archive.find(query, projection), hot)
+
+def find_orders_page(query, projection, sort, limit, history=True):
+    # each collection is already sorted on the keyset, so one page is the
+    # first `limit` entries of the merged streams
+    collections = [mongo.db.orders_archive, mongo.db.orders] if history else [mongo.db.orders]
+
+    pages = [
+        list(collection.find(query, projection).sort(sort).limit(limit))
+        for collection in collections
+    ]
+
+    keys = [field for field, _ in sort]
+    reverse = sort[0][1] < 0
+
+    merged = heapq.merge(
+        *pages,
+        key=lambda o: tuple(o.get(k) for k in keys),
+        reverse=reverse
+    )
+
+    return list(merged)[:limit]
+
+def count_orders(query, history=True):
+    total = mongo.db.orders.count_documents(query)
+
+    if history:
+        total += mongo.db.orders_archive.count_documents(query)
+
+    return total
+
+def aggregate_orders(pipeline, history=True):
+    if not history:
+        return mongo.db.orders.aggregate(pipeline)
+
+    # leading $match stages are repeated inside $unionWith so both
+    # collections filter on their own indexes before the union
+    split = 0
+    while split < len(pipeline) and "$match" in pipeline[split]:
+        split += 1
+
+    leading = pipeline[:split]
+
+    return mongo.db.orders.aggregate([
+        *leading,
+        {"$unionWith": {"coll": "orders_archive", "pipeline": leading}},
+        *pipeline[split:]
+    ])
+
+def _hold_lease(name, holder, seconds):
+    # every worker runs the loop, but only the holder of the lease archives;
+    # a lease that is not renewed lapses and another worker takes over
+    now = datetime.utcnow()
+
+    try:
+        mongo.db.worker_leases.find_one_and_update(
+            {"_id": name, "$or": [{"holder": holder}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"holder": holder, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+
+    return True
+
+def _archive_loop(interval):
+    holder = uuid.uuid4().hex
+
+    while True:
+        try:
+            if _hold_lease(ORDER_ARCHIVER_LEASE, holder, interval * 2):
+                archive_orders()
+        except Exception:
+            logger.exception("Order archival failed")
+
+        time.sleep(interval)
+
+def start_order_archiver(interval=ORDER_ARCHIVE_INTERVAL):
+    threading.Thread(target=_archive_loop, args=(interval,), daemon=True).start()
@@ -0,0 +1,49 @@
+import queue
+import threading
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+ADMIN_CHANNEL = "admin"
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+class OrderEventBus:
+    # in-process fan-out of order changes: the admin channel gets every
+    # order, each user's channel only their own
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, channel):
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+
+            if subscribers:
+                subscribers.discard(subscriber)
+
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def has_subscribers(self, channel):
+        return channel in self._subscribers
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                pass
+
+order_events = OrderEventBus()
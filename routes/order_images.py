@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+from extension import mongo
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+ORDER_IMAGE_URL = "/static/order_images"
+
+SNAPSHOT_LEASE = 60
+SNAPSHOT_IDLE_WAIT = 5
+SNAPSHOT_MAX_ATTEMPTS = 5
+
+def image_digest(path):
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+def snapshot_url(digest, source_url):
+    return f"{ORDER_IMAGE_URL}/{digest}{os.path.splitext(source_url)[1].lower()}"
+
+def _materialize(source_path, target_path):
+    if os.path.exists(target_path):
+        return
+
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+    # link or copy under a temporary name first so a half-written file is
+    # never visible at the snapshot URL
+    tmp_path = f"{target_path}.{uuid.uuid4().hex}.tmp"
+
+    try:
+        os.link(source_path, tmp_path)
+    except OSError:
+        shutil.copyfile(source_path, tmp_path)
+
+    os.replace(tmp_path, target_path)
+
+class OrderImageSnapshotter:
+    # checkout only records snapshot URLs and queues a job per image in
+    # order_image_jobs; this worker thread hardlinks (or copies) the product
+    # images into place afterwards. Jobs live in Mongo so a restart picks
+    # them up again, and snapshots are named by content hash, so identical
+    # images are stored once
+    def __init__(self):
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def enqueue(self, jobs):
+        jobs = [{**job, "claimed_at": None, "attempts": 0} for job in jobs]
+        if not jobs:
+            return
+
+        mongo.db.order_image_jobs.insert_many(jobs)
+
+        self.start()
+        self._wake.set()
+
+    def flush(self, source_url):
+        # called before a product image is deleted, so pending snapshots of
+        # it are taken while the file still exists
+        for job in mongo.db.order_image_jobs.find({"source_url": source_url}):
+            self._process(job)
+
+    def _claim(self):
+        now = datetime.utcnow()
+
+        return mongo.db.order_image_jobs.find_one_and_update(
+            {
+                "attempts": {"$lt": SNAPSHOT_MAX_ATTEMPTS},
+                "$or": [
+                    {"claimed_at": None},
+                    {"claimed_at": {"$lt": now - timedelta(seconds=SNAPSHOT_LEASE)}}
+                ]
+            },
+            {"$set": {"claimed_at": now}},
+            sort=[("_id", 1)]
+        )
+
+    def _run(self):
+        while True:
+            try:
+                job = self._claim()
+            except Exception:
+                logger.exception("Could not claim an order image job")
+                time.sleep(SNAPSHOT_IDLE_WAIT)
+                continue
+
+            if job is None:
+                self._wake.wait(SNAPSHOT_IDLE_WAIT)
+                self._wake.clear()
+                continue
+
+            self._process(job)
+
+    def _process(self, job):
+        try:
+            self._snapshot(job)
+        except Exception:
+            # the claim is left in place, so the job is retried once its
+            # lease runs out
+            logger.exception("Order image snapshot failed for %s", job.get("source_url"))
+            mongo.db.order_image_jobs.update_one({"_id": job["_id"]}, {"$inc": {"attempts": 1}})
+            return
+
+        mongo.db.order_image_jobs.delete_one({"_id": job["_id"]})
+
+    def _snapshot(self, job):
+        source_path = os.path.join(job["root_path"], job["source_url"].lstrip("/"))
+        if not os.path.exists(source_path):
+            return
+
+        digest = job.get("digest") or image_digest(source_path)
+        url = snapshot_url(digest, job["source_url"])
+
+        _materialize(source_path, os.path.join(job["root_path"], url.lstrip("/")))
+
+        if job.get("digest"):
+            return
+
+        # products uploaded before hashes were recorded: point the order at
+        # its snapshot now and remember the hash for the next checkout
+        mongo.db.orders.update_one(
+            {"_id": job["order_id"], "items.product_id": job["product_id"]},
+            {"$set": {"items.$.image_url": url}}
+        )
+        mongo.db.products.update_one(
+            {"_id": job["product_id"], "images.0": job["source_url"]},
+            {"$set": {"image_hash": digest}}
+        )
+
+order_image_snapshots = OrderImageSnapshotter()
@@ -0,0 +1,71 @@
+from datetime import datetime
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from extension import mongo
+from routes.order_archive import count_orders
+import threading
+import os
+
+ORDER_NUMBER_BLOCK = int(os.getenv("ORDER_NUMBER_BLOCK", "1"))
+
+def _month_bounds(year, month):
+    return datetime(year, month, 1), datetime(year + (month // 12), (month % 12) + 1, 1)
+
+class OrderNumberAllocator:
+    # per-month sequences in the counters collection. With block > 1 each
+    # worker reserves `block` numbers per round trip and hands them out
+    # locally, so numbers stay unique but may skip when a worker restarts
+    def __init__(self, block=ORDER_NUMBER_BLOCK):
+        self.block = max(block, 1)
+        self._lock = threading.Lock()
+        self._ranges = {}
+
+    def _reserve(self, key, year, month):
+        while True:
+            counter = mongo.db.counters.find_one_and_update(
+                {"_id": key},
+                {"$inc": {"seq": self.block}},
+                return_document=ReturnDocument.AFTER
+            )
+            if counter:
+                return counter["seq"] - self.block + 1, counter["seq"]
+
+            # first order of the month on this counter: start after any
+            # orders numbered before counters existed
+            start, end = _month_bounds(year, month)
+            existing = count_orders({"created_at": {"$gte": start, "$lt": end}})
+
+            try:
+                mongo.db.counters.insert_one({"_id": key, "seq": existing})
+            except DuplicateKeyError:
+                pass
+
+    def _take(self, key):
+        with self._lock:
+            current, last = self._ranges.get(key, (1, 0))
+
+            if current > last:
+                return None
+
+            self._ranges = {key: (current + 1, last)}
+            return current
+
+    def next(self, now):
+        key = f"orders-{now.year}-{now.month:02d}"
+        number = self._take(key)
+
+        if number is None:
+            # the $inc is atomic on its own, so the round trip runs without
+            # the lock; if another thread refilled meanwhile, its block is
+            # kept and the rest of this one is skipped
+            number, last = self._reserve(key, now.year, now.month)
+
+            with self._lock:
+                current, stored_last = self._ranges.get(key, (1, 0))
+
+                if current > stored_last:
+                    self._ranges = {key: (number + 1, last)}
+
+        return f"ORD-{now.year}-{now.month:02d}-{number:06d}"
+
+order_numbers = OrderNumberAllocator()
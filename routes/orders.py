@@ -1,17 +1,61 @@
-from flask import Blueprint, session, jsonify, request, current_app
+from flask import Blueprint, jsonify, request, current_app, Response
 from extension import mongo
-from utils import login_required
-from routes.utils import apply_campaign_discount
+from utils import login_required, get_user_context
+from routes.utils import apply_campaign_discounts, SHIPPING_COST
+from routes.utils import encode_cursor, decode_cursor, keyset_after
+from routes.category_cache import category_cache
+from routes.category_counts import count_stock_change
+from routes.recommendations import record_copurchases
+from routes.order_numbers import order_numbers
+from routes.order_images import order_image_snapshots, snapshot_url
+from routes.order_events import order_events, user_channel, ADMIN_CHANNEL
+from routes.order_archive import TERMINAL_STATUSES, spans_archive, find_orders_page, count_orders
+from routes.versions import bump_version, product_revision
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from collections import Counter
+from pymongo import UpdateOne
 from datetime import datetime
-import os, shutil
+import queue
 
 order_bp = Blueprint("orders", __name__, url_prefix="/api/orders")
 
+ORDER_PAGE_SIZE = 20
+MAX_ORDER_PAGE_SIZE = 100
+
+ORDER_STREAM_KEEPALIVE = 15
+
+MAX_STATUS_BATCH = 1000
+
+RESERVATION_HISTORY = 20
+
+STATUS_FLOW = {
+    "Pending": ["Approved", "Rejected"],
+    "Approved": ["Out for Delivery", "Rejected"],
+    "Out for Delivery": ["Delivered"],
+    "Delivered": [],
+    "Rejected": []
+}
+
+ADMIN_ORDER_FIELDS = {
+    "order_number": 1,
+    "user_id": 1,
+    "created_at": 1,
+    "status": 1,
+    "order_total": 1,
+    "total_items": 1,
+    "items.name": 1,
+    "items.category": 1,
+    "items.image_url": 1,
+    "items.qty": 1,
+    "items.price_at_purchase": 1
+}
+
 @order_bp.route("/place", methods=["POST"])
 @login_required()
 def place_order():
-    user_id = ObjectId(session.get("user_id"))
+    user = get_user_context()
+    user_id = user.user_id
     cart_doc = mongo.db.carts.find_one({"user_id": user_id})
 
     if not cart_doc or not cart_doc.get("items"):
@@ -19,50 +63,66 @@ def place_order():
 
     cart_items = cart_doc["items"]
 
-    order_image_dir = os.path.join(
-        current_app.root_path,
-        "static",
-        "order_images"
-    )
-    os.makedirs(order_image_dir, exist_ok=True)
+    products = mongo.db.products.find({
+        "_id": {"$in": [item["product_id"] for item in cart_items]}
+    })
+    products_by_id = {p["_id"]: p for p in apply_campaign_discounts(list(products))}
 
-    items = []
+    now = datetime.utcnow()
+    lines = []
 
     for item in cart_items:
-        product_id = str(item["product_id"])
-        qty = item["qty"]
-        product = mongo.db.products.find_one({"_id": ObjectId(product_id)})
-        product = apply_campaign_discount(product)
+        product = products_by_id.get(item["product_id"])
 
         if not product:
             return jsonify({"message": "Product not found"}), 404
 
-        category = mongo.db.category.find_one({"_id": product.get("category_id")})
-
-        if product.get("quantity", 0) < qty:
+        if product.get("quantity", 0) < item["qty"]:
             return jsonify({
                 "message": f"Insufficient stock for {product['name']}"
             }), 400
 
-        snapshot_url = product.get("image_url", "/static/no-image.png")
+        lines.append((product["_id"], item["qty"]))
 
-        if isinstance(product.get("images"), list) and product["images"]:
-            original_url = product["images"][0]
-            original_path = os.path.join(current_app.root_path, original_url.lstrip("/"))
+    with product_revision() as revision:
+        failed, sold_out = _reserve_stock(lines, {"updated_at": now, "revision": revision})
+
+    if failed is not None:
+        return jsonify({
+            "message": f"Insufficient stock for {products_by_id[failed]['name']}"
+        }), 400
 
-            if os.path.exists(original_path):
-                filename = os.path.basename(original_path)
-                snapshot_path = os.path.join(order_image_dir, filename)
+    items = []
+    snapshots = []
 
-                if not os.path.exists(snapshot_path):
-                    shutil.copyfile(original_path, snapshot_path)
+    for item in cart_items:
+        qty = item["qty"]
+        product = products_by_id[item["product_id"]]
 
-                snapshot_url = f"/static/order_images/{filename}"
+        image_url = product.get("image_url", "/static/no-image.png")
 
-        mongo.db.products.update_one(
-            {"_id": ObjectId(product_id)},
-            {"$inc": {"quantity": -qty}}
-        )
+        # the image file itself is snapshotted after the order is saved;
+        # products without a recorded hash keep the live URL until then
+        if isinstance(product.get("images"), list) and product["images"]:
+            source_url = product["images"][0]
+            image_hash = product.get("image_hash")
+
+            if image_hash:
+                image_url = snapshot_url(image_hash, source_url)
+            else:
+                image_url = source_url
+
+            snapshots.append({
+                "root_path": current_app.root_path,
+                "source_url": source_url,
+                "digest": image_hash,
+                "product_id": product["_id"]
+            })
+
+        # decided by the reservation itself, not the earlier read, so only
+        # the checkout that actually emptied a product counts it
+        if product["_id"] in sold_out:
+            count_stock_change(product.get("category_id"), qty, 0)
 
         locked_price = float(
             product.get("final_price")
@@ -73,10 +133,10 @@ def place_order():
         subtotal = locked_price * qty
 
         items.append({
-            "product_id": ObjectId(product_id),
+            "product_id": product["_id"],
             "name": product["name"],
-            "category": category["name"] if category else "Unknown",
-            "image_url": snapshot_url,
+            "category": category_cache.name(product.get("category_id"), "Unknown"),
+            "image_url": image_url,
             "original_price": product.get("original_price", locked_price),
             "price_at_purchase": locked_price,
             "discount_percent": product.get("discount_percent", 0),
@@ -89,34 +149,14 @@ def place_order():
     order_total = sum(item["subtotal"] for item in items)
     total_items = sum(item["qty"] for item in items)
 
-    now = datetime.utcnow()
-
     # membership free shipping logic
-    shipping_cost = 1000
-
-    user = mongo.db.users.find_one({"_id": user_id})
-    membership = user.get("membership") if user else None
-
-    if membership:
-        expiry = membership.get("expires_at")
-        if expiry and expiry > now and membership.get("free_shipping"):
-            shipping_cost = 0
+    shipping_cost = 0 if user.free_shipping else SHIPPING_COST
 
     grand_total = order_total + shipping_cost
 
-    year = now.year
-    month = now.month
-
-    count = mongo.db.orders.count_documents({
-        "created_at": {
-            "$gte": datetime(year, month, 1),
-            "$lt": datetime(year + (month // 12), (month % 12) + 1, 1)
-        }
-    })
+    order_number = order_numbers.next(now)
 
-    order_number = f"ORD-{year}-{month:02d}-{count + 1:06d}"
-
-    mongo.db.orders.insert_one({
+    order = {
         "order_number": order_number,
         "user_id": user_id,
         "items": items,
@@ -131,37 +171,376 @@ def place_order():
         "status_updated_at": now,
         "delivered_at": None,
         "cancelled_at": None,
-    })
+    }
+
+    mongo.db.orders.insert_one(order)
+
+    order_image_snapshots.enqueue(
+        {**snapshot, "order_id": order["_id"]} for snapshot in snapshots
+    )
+    _publish_order(order, "placed")
 
     mongo.db.carts.delete_one({"user_id": user_id})
+    bump_version("catalog")
 
     return jsonify({"order_number": order_number, "items": items}), 200
 
+def _reserve_stock(lines, update):
+    # every line is a conditional decrement in one unordered bulk write;
+    # each also pushes this reservation's token, so a read-back shows which
+    # lines applied, and a line that missed means the ones that applied are
+    # put back. Returns (failed product id or None, ids this reservation
+    # sold out).
+    token = ObjectId()
+
+    mongo.db.products.bulk_write([
+        UpdateOne(
+            {"_id": product_id, "quantity": {"$gte": qty}},
+            {
+                "$inc": {"quantity": -qty},
+                "$set": update,
+                "$push": {"reservations": {"$each": [token], "$slice": -RESERVATION_HISTORY}}
+            }
+        )
+        for product_id, qty in lines
+    ], ordered=False)
+
+    products = {
+        p["_id"]: p
+        for p in mongo.db.products.find(
+            {"_id": {"$in": [product_id for product_id, _ in lines]}},
+            {"quantity": 1, "reservations": 1}
+        )
+    }
+
+    reserved = {
+        product_id for product_id, p in products.items()
+        if token in p.get("reservations", [])
+    }
+
+    failed = next((product_id for product_id, _ in lines if product_id not in reserved), None)
+
+    if failed is not None:
+        _release_stock([line for line in lines if line[0] in reserved], update, token)
+        return failed, set()
+
+    # stock only reaches zero through a decrement, so when it is zero now the
+    # newest reservation on the product is the one that emptied it
+    sold_out = {
+        product_id for product_id, p in products.items()
+        if p.get("quantity", 0) <= 0 and p["reservations"][-1] == token
+    }
+
+    return None, sold_out
+
+def _release_stock(lines, update, token):
+    if not lines:
+        return
+
+    mongo.db.products.bulk_write([
+        UpdateOne(
+            {"_id": product_id},
+            {"$inc": {"quantity": qty}, "$set": update, "$pull": {"reservations": token}}
+        )
+        for product_id, qty in lines
+    ], ordered=False)
+
 @order_bp.route("/all", methods=["GET"])
 @login_required(role="admin")
 def get_all_orders():
+    try:
+        limit = int(request.args.get("limit", ORDER_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"message": "Invalid limit"}), 400
+
+    limit = max(1, min(limit, MAX_ORDER_PAGE_SIZE))
+
+    filters = []
+
+    status = request.args.get("status")
+    if status and status != "All":
+        filters.append({"status": status})
+
+    category = request.args.get("category")
+    if category and category != "All":
+        filters.append({"items.category": category})
+
+    try:
+        created = {}
+
+        if request.args.get("start"):
+            created["$gte"] = datetime.fromisoformat(request.args["start"].replace("Z", ""))
+
+        if request.args.get("end"):
+            created["$lte"] = datetime.fromisoformat(request.args["end"].replace("Z", ""))
+    except ValueError:
+        return jsonify({"message": "Invalid date range"}), 400
+
+    if created:
+        filters.append({"created_at": created})
+
+    query = {"$and": filters} if filters else {}
+    cursor = request.args.get("cursor")
+
+    history = spans_archive(status=status if status != "All" else None, start=created.get("$gte"))
+
+    # the total is only counted for the first page of a listing
+    total = None
+
+    if not cursor:
+        if filters:
+            total = count_orders(query, history)
+        else:
+            total = mongo.db.orders.estimated_document_count()
+
+            if history:
+                total += mongo.db.orders_archive.estimated_document_count()
+
+    if cursor:
+        try:
+            value, last_id = decode_cursor(cursor)
+        except ValueError:
+            return jsonify({"message": "Invalid cursor"}), 400
+
+        filters.append(keyset_after("created_at", -1, value, last_id))
+        query = {"$and": filters}
+
+    page = find_orders_page(
+        query,
+        ADMIN_ORDER_FIELDS,
+        [("created_at", -1), ("_id", -1)],
+        limit + 1,
+        history
+    )
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1].get("created_at"), page[-1]["_id"])
+
+    users = {
+        u["_id"]: u
+        for u in mongo.db.users.find(
+            {"_id": {"$in": list({o["user_id"] for o in page})}},
+            {"username": 1, "email": 1}
+        )
+    } if page else {}
+
     orders = []
 
-    for o in mongo.db.orders.find():
-        user = mongo.db.users.find_one(
-            {"_id": ObjectId(o["user_id"])}
+    for o in page:
+        orders.append(_admin_order(o, users.get(o["user_id"], {})))
+
+    return jsonify({"orders": orders, "next_cursor": next_cursor, "total": total}), 200
+
+def _admin_order(o, user):
+    return {
+        "id": o["_id"],
+        "order_number": o.get("order_number", o["_id"]),
+        "username": user.get("username", "Unknown"),
+        "created_at": o["created_at"],
+        "customer_email": user.get("email", "Unknown"),
+        "items": o.get("items", []),
+        "order_total": o.get("order_total", 0),
+        "total_items": o.get("total_items", 0),
+        "status": o.get("status"),
+    }
+
+def user_order_summary(o):
+    order_total = sum(
+        (item.get("price_at_purchase") or item.get("price", 0)) * item["qty"]
+        for item in o["items"]
+    )
+
+    return {
+        "id": o["_id"],
+        "order_number": o.get("order_number", o["_id"]),
+        "created_at": o["created_at"],
+        "order_total": order_total,
+        "grand_total": o.get("grand_total", order_total),
+        "total_items": o.get("total_items") or sum(item["qty"] for item in o["items"]),
+        "status": o["status"],
+        "status_updated_at": o.get("status_updated_at"),
+        "delivered_at": o.get("delivered_at"),
+        "items": o["items"],
+    }
+
+def _publish_order(order, kind, user=None):
+    # shaped like the admin listing and the user's profile orders, so
+    # clients can drop the event straight into what they already render
+    if order_events.has_subscribers(ADMIN_CHANNEL):
+        if user is None:
+            user = mongo.db.users.find_one({"_id": order["user_id"]}, {"username": 1, "email": 1})
+        order_events.publish(ADMIN_CHANNEL, {"type": kind, "order": _admin_order(order, user or {})})
+
+    channel = user_channel(order["user_id"])
+    if order_events.has_subscribers(channel):
+        order_events.publish(channel, {"type": kind, "order": user_order_summary(order)})
+
+def _order_stream(channel):
+    subscriber = order_events.subscribe(channel)
+    encode = current_app.json.dumps
+
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+
+            while True:
+                try:
+                    event = subscriber.get(timeout=ORDER_STREAM_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+
+                yield f"event: order\ndata: {encode(event)}\n\n"
+        finally:
+            order_events.unsubscribe(channel, subscriber)
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@order_bp.route("/stream", methods=["GET"])
+@login_required(role="admin")
+def admin_order_stream():
+    return _order_stream(ADMIN_CHANNEL)
+
+@order_bp.route("/my-stream", methods=["GET"])
+@login_required()
+def user_order_stream():
+    return _order_stream(user_channel(get_user_context().user_id))
+
+def _status_change_error(current_status, new_status):
+    if current_status in TERMINAL_STATUSES:
+        return "Order status is locked"
+
+    if new_status not in STATUS_FLOW.get(current_status, []):
+        return f"Cannot change status from {current_status} to {new_status}"
+
+    return None
+
+def _record_sales(orders, now):
+    # one $inc per product, however many delivered orders contain it
+    sold = Counter()
+
+    for order in orders:
+        for item in order.get("items", []):
+            sold[ObjectId(item["product_id"])] += item.get("qty", 0)
+
+    if not sold:
+        return
+
+    with product_revision() as revision:
+        mongo.db.products.bulk_write([
+            UpdateOne(
+                {"_id": product_id},
+                {
+                    "$inc": {"sales_count": qty},
+                    "$set": {"updated_at": now, "revision": revision}
+                }
+            )
+            for product_id, qty in sold.items()
+        ], ordered=False)
+
+@order_bp.route("/update-status", methods=["PUT"])
+@login_required(role="admin")
+def update_order_statuses():
+    data = request.get_json() or {}
+    new_status = data.get("status")
+    order_ids = data.get("order_ids")
+
+    if not isinstance(order_ids, list) or not order_ids or len(order_ids) > MAX_STATUS_BATCH:
+        return jsonify({"message": "Invalid order ids"}), 400
+
+    try:
+        order_ids = list(dict.fromkeys(ObjectId(str(order_id)) for order_id in order_ids))
+    except (TypeError, InvalidId):
+        return jsonify({"message": "Invalid order ids"}), 400
+
+    orders = {
+        o["_id"]: o
+        for o in mongo.db.orders.find({"_id": {"$in": order_ids}})
+    }
+
+    now = datetime.utcnow()
+
+    update_data = {
+        "status": new_status,
+        "status_updated_at": now,
+        # marks the orders this request moved, for the read-back below
+        "status_update_id": ObjectId(),
+    }
+
+    if new_status == "Delivered":
+        update_data["delivered_at"] = now
+
+    failed = []
+    attempted = []
+    updates = []
+
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        error = _status_change_error(order.get("status"), new_status) if order else "Order not found"
+
+        if error:
+            failed.append({"order_id": order_id, "message": error})
+            continue
+
+        # the filter repeats the status that was validated, so an order
+        # changed by someone else in the meantime is left alone
+        attempted.append(order_id)
+        updates.append(UpdateOne(
+            {"_id": order_id, "status": order["status"]},
+            {"$set": update_data}
+        ))
+
+    if not updates:
+        return jsonify({"message": "No orders could be updated", "failed": failed}), 400
+
+    mongo.db.orders.bulk_write(updates, ordered=False)
+
+    # bulk results only carry counts, so read back which orders this
+    # request actually moved
+    applied = {
+        o["_id"]
+        for o in mongo.db.orders.find(
+            {"_id": {"$in": attempted}, "status_update_id": update_data["status_update_id"]},
+            {"_id": 1}
         )
-        order_total = o.get("order_total", 0)
-        total_items = o.get("total_items", 0)
-
-        orders.append({
-            "id": str(o["_id"]),
-            "order_number": o.get("order_number", str(o["_id"])),
-            "username": user.get("username", "Unknown") if user else "Unknown",
-            "created_at": o["created_at"].isoformat(),
-            "customer_email": user.get("email", "Unknown") if user else "Unknown",
-            "items": o.get("items", []),
-            "order_total": order_total,
-            "total_items": total_items,
-            "status": o.get("status"),
-        })
+    }
 
-    return jsonify({"orders": orders}), 200
+    changed = []
+
+    for order_id in attempted:
+        if order_id in applied:
+            changed.append({**orders[order_id], **update_data})
+        else:
+            failed.append({"order_id": order_id, "message": "Order was changed by another request"})
+
+    if new_status == "Delivered" and changed:
+        _record_sales(changed, now)
+        record_copurchases(*changed)
+        bump_version("catalog")
+
+    users = {}
+    if changed and order_events.has_subscribers(ADMIN_CHANNEL):
+        users = {
+            u["_id"]: u
+            for u in mongo.db.users.find(
+                {"_id": {"$in": list({o["user_id"] for o in changed})}},
+                {"username": 1, "email": 1}
+            )
+        }
+
+    for order in changed:
+        _publish_order(order, "status", users.get(order["user_id"], {}))
+
+    return jsonify({
+        "updated": [o["_id"] for o in changed],
+        "failed": failed
+    }), 200
 
 @order_bp.route("/update-status/<order_id>", methods=["PUT"])
 @login_required(role="admin")
@@ -169,28 +548,13 @@ def update_order_status(order_id):
     data = request.get_json()
     new_status = data.get("status")
 
-    STATUS_FLOW = {
-        "Pending": ["Approved", "Rejected"],
-        "Approved": ["Out for Delivery", "Rejected"],
-        "Out for Delivery": ["Delivered"],
-        "Delivered": [],
-        "Rejected": []
-    }
-
     order = mongo.db.orders.find_one({"_id": ObjectId(order_id)})
     if not order:
         return jsonify({"message": "Order not found"}), 404
 
-    current_status = order.get("status")
-
-    if current_status in ["Delivered", "Rejected", "Cancelled"]:
-        return jsonify({"message": "Order status is locked"}), 400
-
-    allowed_next = STATUS_FLOW.get(current_status, [])
-    if new_status not in allowed_next:
-        return jsonify({
-            "message": f"Cannot change status from {current_status} to {new_status}"
-        }), 400
+    error = _status_change_error(order.get("status"), new_status)
+    if error:
+        return jsonify({"message": error}), 400
 
     now = datetime.utcnow()
     ts = int(now.timestamp())
@@ -202,18 +566,19 @@ def update_order_status(order_id):
 
     if new_status == "Delivered":
         update_data["delivered_at"] = now
-
-        for item in order.get("items", []):
-            mongo.db.products.update_one(
-                {"_id": ObjectId(item["product_id"])},
-                {"$inc": {"sales_count": item.get("qty", 0)}}
-            )
+        _record_sales([order], now)
 
     mongo.db.orders.update_one(
         {"_id": ObjectId(order_id)},
         {"$set": update_data}
     )
 
+    if new_status == "Delivered":
+        record_copurchases(order)
+        bump_version("catalog")
+
+    _publish_order({**order, **update_data}, "status")
+
     return jsonify({"order": order}), 200
 
 @order_bp.route("/cancel/<order_id>", methods=["PUT"])
@@ -230,35 +595,16 @@ def cancel_order(order_id):
     now = datetime.utcnow()
     ts = int(now.timestamp())
 
+    update_data = {
+        "status": "Cancelled",
+        "status_updated_at": now,
+        "cancelled_at": now,
+    }
+
     mongo.db.orders.update_one(
         {"_id": ObjectId(order_id)},
-        {"$set": {
-            "status": "Cancelled",
-            "status_updated_at": now,
-            "cancelled_at": now,
-        }}
-    )
-    return jsonify({"order": order}), 200
-
-@order_bp.route("/last-update", methods=["GET"])
-@login_required(role="admin")
-def last_order_update():
-    latest = mongo.db.orders.find_one({}, sort=[("status_updated_at", -1)])
-
-    return jsonify({
-        "last_update": latest["status_updated_at"].isoformat() if latest else None
-    }), 200
-
-@order_bp.route("/user-last-update", methods=["GET"])
-@login_required()
-def user_last_order_update():
-    user_id = ObjectId(session.get("user_id"))
-
-    latest = mongo.db.orders.find_one(
-        {"user_id": user_id},
-        sort=[("status_updated_at", -1)]
+        {"$set": update_data}
     )
+    _publish_order({**order, **update_data}, "cancelled")
 
-    return jsonify({
-        "last_update": latest["status_updated_at"].isoformat() if latest else None
-    }), 200
+    return jsonify({"order": order}), 200
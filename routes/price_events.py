@@ -0,0 +1,152 @@
+from datetime import datetime
+from extension import mongo
+from routes.campaign_index import campaign_index
+from routes.utils import price_product, price_delta, pricing_key
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+PRICE_EVENTS_MAX_SLEEP = 30
+SUBSCRIBER_QUEUE_SIZE = 100
+
+class TierMember:
+    # pricing inputs shared by one group of subscribers, shaped like UserContext
+    def __init__(self, key):
+        self.membership_plan, self.member_discount, self.early_campaign_hours = key
+
+class PriceEventHub:
+    # a background thread wakes at every campaign boundary (or when a
+    # campaign is written), diffs the visible campaign per product for each
+    # subscribed pricing key and pushes re-priced deltas to its subscribers
+    def __init__(self, max_sleep=PRICE_EVENTS_MAX_SLEEP):
+        self.max_sleep = max_sleep
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subscribers = {}
+        self._snapshots = {}
+        self._thread = None
+
+    def subscribe(self, member):
+        tier = pricing_key(member)
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+        # the snapshot can hit Mongo, so build it before taking the lock; if
+        # another stream got there first its snapshot wins
+        snapshot = None if tier in self._snapshots else self._visible(tier, datetime.utcnow())
+
+        with self._lock:
+            self._subscribers.setdefault(tier, set()).add(subscriber)
+
+            if snapshot is not None:
+                self._snapshots.setdefault(tier, snapshot)
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+        return tier, subscriber
+
+    def unsubscribe(self, tier, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(tier)
+
+            if subscribers:
+                subscribers.discard(subscriber)
+
+                if not subscribers:
+                    del self._subscribers[tier]
+                    self._snapshots.pop(tier, None)
+
+    def notify(self):
+        self._wake.set()
+
+    def _visible(self, tier, now):
+        early_hours = TierMember(tier).early_campaign_hours
+
+        return {
+            product_id: campaign["_id"]
+            for product_id, campaign in campaign_index.visible(now, early_hours).items()
+        }
+
+    def _sleep_seconds(self, now):
+        seconds = self.max_sleep
+
+        with self._lock:
+            tiers = list(self._subscribers)
+
+        for tier in tiers:
+            boundary = campaign_index.next_boundary(now, TierMember(tier).early_campaign_hours)
+
+            if boundary:
+                seconds = min(seconds, max((boundary - now).total_seconds(), 0.05))
+
+        return seconds
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+
+            self._wake.wait(self._sleep_seconds(datetime.utcnow()))
+            self._wake.clear()
+
+            try:
+                self._tick()
+            except Exception:
+                logger.exception("Price event tick failed")
+
+    def _tick(self):
+        now = datetime.utcnow()
+
+        with self._lock:
+            tiers = list(self._subscribers)
+
+        for tier in tiers:
+            current = self._visible(tier, now)
+
+            with self._lock:
+                if tier not in self._subscribers:
+                    continue
+
+                previous = self._snapshots.get(tier, {})
+                self._snapshots[tier] = current
+
+            changed = [
+                product_id
+                for product_id in set(current) | set(previous)
+                if current.get(product_id) != previous.get(product_id)
+            ]
+
+            if changed:
+                self._publish(tier, self._deltas(tier, changed, now))
+
+    def _deltas(self, tier, product_ids, now):
+        member = TierMember(tier)
+        deltas = []
+
+        for product in mongo.db.products.find({"_id": {"$in": product_ids}}, {"price": 1}):
+            campaign = campaign_index.effective(product["_id"], now, member.early_campaign_hours)
+            price_product(product, campaign, member)
+
+            deltas.append(price_delta(product, campaign))
+
+        return deltas
+
+    def _publish(self, tier, deltas):
+        if not deltas:
+            return
+
+        with self._lock:
+            subscribers = list(self._subscribers.get(tier, ()))
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(deltas)
+            except queue.Full:
+                pass
+
+price_events = PriceEventHub()
@@ -1,17 +1,63 @@
-from flask import Blueprint, request, jsonify, current_app 
+from flask import Blueprint, request, jsonify, current_app, Response
 from bson.objectid import ObjectId
 from bson.errors import InvalidId
+from pymongo import ReturnDocument
 from extension import mongo
-from utils import login_required
-from routes.utils import title_case, slugify
-from routes.utils import apply_campaign_discount
+from utils import login_required, get_user_context
+from routes.utils import title_case, slugify, encode_cursor, decode_cursor, keyset_after
+from routes.utils import final_price_filter, catalog_conditional, cached_feed, price_delta
+from routes.versions import bump_version, product_revision, product_revision_high_water, touch_products
+from routes.price_events import price_events
+from routes.utils import apply_campaign_discount, apply_campaign_discounts
+from routes.campaign_index import campaign_index, CAMPAIGN_FIELDS, CAMPAIGN_HISTORY
+from routes.search_index import product_search_index
+from routes.category_cache import category_cache
+from routes.recommendations import related_product_ids
+from routes.order_images import image_digest, order_image_snapshots
+from routes.category_counts import count_product_added, count_product_removed, count_product_moved, count_stock_change
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import os
 import uuid
 import json
+import queue
 
 product_bp = Blueprint("products", __name__, url_prefix="/api/products")
 
+PRODUCT_PAGE_SIZE = 24
+MAX_PRODUCT_PAGE_SIZE = 100
+
+PRICE_STREAM_KEEPALIVE = 15
+
+RELATED_PRODUCTS_LIMIT = 6
+
+PRODUCT_SORTS = {
+    "newest": ("created_at", -1),
+    "best_selling": ("sales_count", -1),
+    "price_asc": ("price", 1),
+    "price_desc": ("price", -1),
+    "name_asc": ("name", 1),
+    "name_desc": ("name", -1)
+}
+
+PRODUCT_CARD_FIELDS = {
+    "name": 1,
+    "description": 1,
+    "category_id": 1,
+    "price": 1,
+    "quantity": 1,
+    "sales_count": 1,
+    "created_at": 1,
+    "image_url": 1,
+    "images": {"$slice": 5},
+    "revision": 1
+}
+
+# checkout bookkeeping, never sent to clients
+PRODUCT_PRIVATE_FIELDS = {"reservations": 0}
+
+MAX_PRODUCT_CHANGES = 500
+
 @product_bp.route("/add", methods=["POST"])
 @login_required(role="admin")
 def add_product():
@@ -62,93 +108,322 @@ def add_product():
         return jsonify({"message": "Image upload failed"}), 400
     
     now = datetime.utcnow()
+    image_hash = image_digest(os.path.join(upload_dir, os.path.basename(image_urls[0])))
+
+    with product_revision() as revision:
+        result = mongo.db.products.insert_one({
+            "name": name,
+            "description": desc_,
+            "category_id": ObjectId(category_id),
+            "price": float(price),
+            "images": image_urls,
+            "image_url": image_urls[0],
+            "image_hash": image_hash,
+            "quantity": 0,
+            "sales_count": 0,
+            "specs": specs,
+            "details": details,
+            "created_at": now,
+            "updated_at": now,
+            "revision": revision
+        })
 
-    result = mongo.db.products.insert_one({
-        "name": name,
-        "description": desc_,
-        "category_id": ObjectId(category_id),
-        "price": float(price),
-        "images": image_urls,
-        "image_url": image_urls[0],
-        "quantity": 0,
-        "sales_count": 0,
-        "specs": specs,
-        "details": details,
-        "created_at": now
-    })
+    count_product_added({"category_id": ObjectId(category_id), "quantity": 0})
+    bump_version("catalog")
 
     product = mongo.db.products.find_one({"_id": result.inserted_id})
-    product["_id"] = str(product["_id"])
+    product_search_index.upsert(product, category_doc["name"])
+
     product["category"] = category_doc["name"]
 
     return jsonify(product), 201
 
+def _price_arg(name):
+    value = request.args.get(name)
+    if value in [None, ""]:
+        return None
+
+    price = float(value)
+    if price < 0:
+        raise ValueError("Negative price")
+
+    return price
+
 @product_bp.route("/", methods=["GET"])
+@catalog_conditional
 def get_products():
+    sort = PRODUCT_SORTS.get(request.args.get("sort") or "newest")
+    if not sort:
+        return jsonify({"message": "Invalid sort"}), 400
+
+    sort_key, direction = sort
+
+    try:
+        limit = int(request.args.get("limit", PRODUCT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"message": "Invalid limit"}), 400
+
+    limit = max(1, min(limit, MAX_PRODUCT_PAGE_SIZE))
+
+    filters = []
+
+    category_id = request.args.get("category_id")
+    if category_id:
+        try:
+            filters.append({"category_id": ObjectId(category_id)})
+        except InvalidId:
+            return jsonify({"message": "Invalid category"}), 400
+
+    if request.args.get("in_stock") in ["1", "true"]:
+        filters.append({"quantity": {"$gt": 0}})
+
+    try:
+        min_price = _price_arg("min_price")
+        max_price = _price_arg("max_price")
+    except ValueError:
+        return jsonify({"message": "Invalid price range"}), 400
+
+    if min_price is not None or max_price is not None:
+        filters.append(final_price_filter(min_price, max_price))
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            value, last_id = decode_cursor(cursor)
+        except ValueError:
+            return jsonify({"message": "Invalid cursor"}), 400
+
+        filters.append(keyset_after(sort_key, direction, value, last_id))
+
+    if not filters:
+        query = {}
+    elif len(filters) == 1:
+        query = filters[0]
+    else:
+        query = {"$and": filters}
+
+    projection = PRODUCT_PRIVATE_FIELDS if request.args.get("fields") == "full" else PRODUCT_CARD_FIELDS
+
+    page = list(
+        mongo.db.products.find(query, projection)
+        .sort([(sort_key, direction), ("_id", direction)])
+        .limit(limit + 1)
+    )
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1].get(sort_key), page[-1]["_id"])
+
+    products = []
+
+    for product in apply_campaign_discounts(page):
+        product["category"] = category_cache.name(product.get("category_id"))
+
+        products.append(product)
+
+    return jsonify({"products": products, "next_cursor": next_cursor}), 200
+
+@product_bp.route("/search", methods=["GET"])
+def search_products():
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return jsonify({"products": []}), 200
+
+    try:
+        limit = int(request.args.get("limit", PRODUCT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"message": "Invalid limit"}), 400
+
+    limit = max(1, min(limit, MAX_PRODUCT_PAGE_SIZE))
+
+    category_id = request.args.get("category_id")
+    if category_id:
+        try:
+            category_id = ObjectId(category_id)
+        except InvalidId:
+            return jsonify({"message": "Invalid category"}), 400
+
+    hits = product_search_index.search(q, limit=limit, category_id=category_id or None)
+    if not hits:
+        return jsonify({"products": []}), 200
+
+    scores = dict(hits)
+
+    found = {
+        p["_id"]: p
+        for p in mongo.db.products.find(
+            {"_id": {"$in": list(scores)}},
+            PRODUCT_CARD_FIELDS
+        )
+    }
+
+    ranked = [found[doc_id] for doc_id, _ in hits if doc_id in found]
+
+    products = []
+
+    for product in apply_campaign_discounts(ranked):
+        product["score"] = round(scores[product["_id"]], 4)
+        product["category"] = category_cache.name(product.get("category_id"))
+
+        products.append(product)
+
+    return jsonify({"products": products}), 200
+
+@product_bp.route("/stream", methods=["GET"])
+def price_stream():
+    tier, subscriber = price_events.subscribe(get_user_context())
+    encode = current_app.json.dumps
+
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+
+            while True:
+                try:
+                    deltas = subscriber.get(timeout=PRICE_STREAM_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+
+                yield f"event: prices\ndata: {encode(deltas)}\n\n"
+        finally:
+            price_events.unsubscribe(tier, subscriber)
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@product_bp.route("/changes", methods=["GET"])
+def get_product_changes():
+    now = datetime.utcnow()
+    since = request.args.get("since")
+
+    # changes are served up to the high-water mark only, so a revision
+    # still being written is never skipped over
+    high_water = product_revision_high_water()
+
+    if since is None:
+        return jsonify({
+            "revision": high_water,
+            "synced_at": now,
+            "products": [],
+            "deleted": [],
+            "prices": []
+        }), 200
+
+    try:
+        since = int(since)
+        synced_at = datetime.fromisoformat(request.args.get("synced_at", ""))
+    except ValueError:
+        return jsonify({"message": "Invalid sync position"}), 400
+
+    revision = max(since, high_water)
+    window = {"$gt": since, "$lte": revision}
+
+    changed = list(
+        mongo.db.products.find({"revision": window}, PRODUCT_CARD_FIELDS)
+        .sort("revision", 1)
+        .limit(MAX_PRODUCT_CHANGES + 1)
+    )
+
+    if len(changed) > MAX_PRODUCT_CHANGES or now - synced_at > CAMPAIGN_HISTORY:
+        return jsonify({
+            "reset": True,
+            "revision": high_water,
+            "synced_at": now
+        }), 200
+
+    deleted = list(mongo.db.product_tombstones.find({"revision": window}))
+
+    member = get_user_context()
+    changed_ids = {p["_id"] for p in changed}
+
+    # campaigns that started or ended since the last sync re-price products
+    # whose revision did not move
+    flipped = [
+        product_id
+        for product_id in campaign_index.flipped(synced_at, now, member.early_campaign_hours)
+        if product_id not in changed_ids
+    ]
+
+    prices = []
+
+    if flipped:
+        for product in apply_campaign_discounts(list(
+            mongo.db.products.find({"_id": {"$in": flipped}}, {"price": 1})
+        )):
+            campaign = campaign_index.effective(product["_id"], now, member.early_campaign_hours)
+            prices.append(price_delta(product, campaign))
+
     products = []
 
-    for product in mongo.db.products.find():
-        product = apply_campaign_discount(product)
-        product["_id"] = str(product["_id"])
-        product["category_id"] = str(product.get("category_id"))
+    for product in apply_campaign_discounts(changed):
+        product["category"] = category_cache.name(product.get("category_id"))
 
-        category = mongo.db.category.find_one({"_id": ObjectId(product["category_id"])})
-        product["category"] = category["name"] if category else ""
-        
         products.append(product)
 
-    return jsonify(products), 200
+    return jsonify({
+        "revision": revision,
+        "synced_at": now,
+        "products": products,
+        "deleted": [d["_id"] for d in deleted],
+        "prices": prices
+    }), 200
 
 @product_bp.route("/<product_id>", methods=["GET"])
 def get_single_product(product_id):
     now = datetime.utcnow()
-    product = mongo.db.products.find_one({"_id": ObjectId(product_id)})
+    product = mongo.db.products.find_one({"_id": ObjectId(product_id)}, PRODUCT_PRIVATE_FIELDS)
 
     if not product:
         return jsonify({"message": "Product not found"}), 404
 
     product = apply_campaign_discount(product)
 
-    campaign = mongo.db.campaigns.find_one({
-        "product_id": ObjectId(product_id),
-        "start": {"$lte": now},
-        "end": {"$gte": now}
-    })
+    campaign = campaign_index.effective(product["_id"], now)
 
     if campaign:
-        product["campaign_end"] = campaign["end"].isoformat()
+        product["campaign_end"] = campaign["end"]
     else:
         product["campaign_end"] = None
 
-    product["_id"] = str(product["_id"])
-
     if "category_id" in product:
-        cat = mongo.db.category.find_one({"_id": product["category_id"]})
-        product["category"] = cat["name"] if cat else "Unknown"
+        product["category"] = category_cache.name(product["category_id"], "Unknown")
 
     return jsonify(product), 200
 
 @product_bp.route("/<product_id>/related", methods=["GET"])
 def get_related_products(product_id):
 
-    current = mongo.db.products.find_one({"_id": ObjectId(product_id)})
+    current = mongo.db.products.find_one({"_id": ObjectId(product_id)}, {"category_id": 1})
     if not current:
         return jsonify({"message": "Product not found"}), 404
 
-    category_id = current.get("category_id")
+    # co-purchased products first, in neighbor order, then category peers
+    # to fill whatever is left
+    neighbor_ids = related_product_ids(current["_id"])
+    in_stock = {}
 
-    cursor = mongo.db.products.find({
-        "_id": {"$ne": ObjectId(product_id)},
-        "category_id": category_id,
-        "quantity": {"$gt": 0}
-    }).limit(6)
+    if neighbor_ids:
+        for p in mongo.db.products.find({"_id": {"$in": neighbor_ids}, "quantity": {"$gt": 0}}):
+            in_stock[p["_id"]] = p
 
-    related = []
-    for p in cursor:
-        p = apply_campaign_discount(p)
+    candidates = [in_stock[pid] for pid in neighbor_ids if pid in in_stock][:RELATED_PRODUCTS_LIMIT]
+
+    if len(candidates) < RELATED_PRODUCTS_LIMIT:
+        candidates += list(mongo.db.products.find({
+            "_id": {"$nin": [current["_id"]] + [p["_id"] for p in candidates]},
+            "category_id": current.get("category_id"),
+            "quantity": {"$gt": 0}
+        }).limit(RELATED_PRODUCTS_LIMIT - len(candidates)))
 
+    related = []
+    for p in apply_campaign_discounts(candidates):
         related.append({
-            "id": str(p["_id"]),
+            "id": p["_id"],
             "name": p.get("name"),
             "price": p.get("price"),
             "offer_price": p.get("offer_price"),
@@ -188,10 +463,17 @@ def update_stock():
     if new_qty < 0:
         new_qty = 0
 
-    mongo.db.products.update_one(
-        {"_id": ObjectId(product_id)},
-        {"$set": {"quantity": new_qty}}
-    )
+    with product_revision() as revision:
+        mongo.db.products.update_one(
+            {"_id": ObjectId(product_id)},
+            {"$set": {
+                "quantity": new_qty,
+                "updated_at": datetime.utcnow(),
+                "revision": revision
+            }}
+        )
+    count_stock_change(product.get("category_id"), current_qty, new_qty)
+    bump_version("catalog")
 
     return jsonify({
         "Message": "Stock updated",
@@ -243,6 +525,7 @@ def update_product(product_id):
         for old_img in product.get("images", []):
             old_path = os.path.join(current_app.root_path, old_img.lstrip("/"))
             if os.path.exists(old_path):
+                order_image_snapshots.flush(old_img)
                 os.remove(old_path)
 
         final_category_id = ObjectId(category_id) if category_id else product["category_id"]
@@ -275,19 +558,31 @@ def update_product(product_id):
 
         update_data["images"] = new_images
         update_data["image_url"] = new_images[0]
+        update_data["image_hash"] = image_digest(os.path.join(upload_dir, os.path.basename(new_images[0])))
 
     if not update_data:
         return jsonify({"message": "Nothing to update"}), 400
-    
-    result = mongo.db.products.update_one({"_id": ObjectId(product_id)}, {"$set": update_data})
+
+    update_data["updated_at"] = datetime.utcnow()
+
+    with product_revision() as revision:
+        update_data["revision"] = revision
+        result = mongo.db.products.update_one({"_id": ObjectId(product_id)}, {"$set": update_data})
 
     if result.matched_count == 0:
         return jsonify({"message": "Product not found during update"}), 404
 
-    updated_product = mongo.db.products.find_one({"_id": ObjectId(product_id)})
+    if "category_id" in update_data:
+        count_product_moved(product, update_data["category_id"])
 
-    updated_product["_id"] = str(updated_product["_id"])
-    updated_product["category_id"] = str(updated_product.get("category_id"))
+    bump_version("catalog")
+
+    updated_product = mongo.db.products.find_one({"_id": ObjectId(product_id)}, PRODUCT_PRIVATE_FIELDS)
+
+    product_search_index.upsert(
+        updated_product,
+        category_cache.name(updated_product.get("category_id"))
+    )
 
     return jsonify(updated_product), 200
 
@@ -307,6 +602,7 @@ def delete_product(product_id):
         img_path = os.path.join(current_app.root_path, img.lstrip("/"))
 
         if os.path.exists(img_path):
+            order_image_snapshots.flush(img)
             os.remove(img_path)
             if not product_folder:
                 product_folder = os.path.dirname(img_path)
@@ -319,6 +615,15 @@ def delete_product(product_id):
         os.rmdir(category_folder)
 
     mongo.db.products.delete_one({"_id": ObjectId(product_id)})
+    count_product_removed(product)
+    with product_revision() as revision:
+        mongo.db.product_tombstones.update_one(
+            {"_id": ObjectId(product_id)},
+            {"$set": {"revision": revision, "deleted_at": datetime.utcnow()}},
+            upsert=True
+        )
+    bump_version("catalog")
+    product_search_index.remove(ObjectId(product_id))
 
     return jsonify({"message": "Product deleted successfully"}), 200
 
@@ -340,7 +645,7 @@ def create_campaign():
     if not product_id or not start or not end:
         return jsonify({"message": "Missing fields"}), 400
 
-    mongo.db.campaigns.insert_one({
+    campaign = {
         "product_id": ObjectId(product_id),
         "priority": priority,
         "discount_percent": discount_percent,
@@ -348,7 +653,13 @@ def create_campaign():
         "start": datetime.fromisoformat(start),
         "end": datetime.fromisoformat(end),
         "created_at": datetime.utcnow()
-    })
+    }
+
+    mongo.db.campaigns.insert_one(campaign)
+    campaign_index.upsert(campaign)
+    touch_products([campaign["product_id"]])
+    bump_version("campaign")
+    price_events.notify()
 
     return jsonify({"message": "Campaign created"})
 
@@ -394,15 +705,15 @@ def get_campaigns():
             status = "SCHEDULED"
 
         result.append({
-            "id": str(c["_id"]),
-            "product_id": str(c["product"]["_id"]),
+            "id": c["_id"],
+            "product_id": c["product"]["_id"],
             "name": c["product"]["name"],
             "image": c["product"].get("image_url"),
             "category": c["category"]["name"] if c.get("category") else "",
             "title": c.get("title"),
             "priority": c.get("priority", "MEDIUM"),
-            "start": c["start"].isoformat(),
-            "end": c["end"].isoformat(),
+            "start": c["start"],
+            "end": c["end"],
             "status": status
         })
 
@@ -412,17 +723,24 @@ def get_campaigns():
 @login_required(role="admin")
 def stop_campaign(cid):
 
-    mongo.db.campaigns.update_one(
+    campaign = mongo.db.campaigns.find_one_and_update(
         {"_id": ObjectId(cid)},
-        {"$set": {"end": datetime.utcnow()}}
+        {"$set": {"end": datetime.utcnow()}},
+        projection=CAMPAIGN_FIELDS,
+        return_document=ReturnDocument.AFTER
     )
 
+    if campaign:
+        campaign_index.upsert(campaign)
+        touch_products([campaign["product_id"]])
+        bump_version("campaign")
+        price_events.notify()
+
     return jsonify({"message": "Campaign stopped"})
 
-@product_bp.route("/featured", methods=["GET"])
-def get_featured_products():
-    now = datetime.utcnow()
+HOME_FEED_SIZE = 8
 
+def _live_campaigns(now):
     pipeline = [
         {
             "$match": {
@@ -450,78 +768,80 @@ def get_featured_products():
                 "start": -1
             }
         },
-        {
-            "$lookup": {
-                "from": "products",
-                "localField": "product_id",
-                "foreignField": "_id",
-                "as": "product"
-            }
-        },
-        {"$unwind": "$product"}
+        {"$project": {"product_id": 1, "end": 1}}
     ]
 
-    campaigns = list(mongo.db.campaigns.aggregate(pipeline))
-    products = []
+    return list(mongo.db.campaigns.aggregate(pipeline))
 
-    for c in campaigns:
-        p = c["product"]
-        p = apply_campaign_discount(p)
+def _product_ids_by(sort_key):
+    return [
+        p["_id"] for p in
+        mongo.db.products.find({}, {"_id": 1})
+        .sort(sort_key, -1)
+        .limit(HOME_FEED_SIZE)
+    ]
 
-        category = mongo.db.category.find_one(
-            {"_id": p.get("category_id")}
-        )
+def _build_feeds(campaigns=(), top_ids=(), new_ids=()):
+    ids = list(dict.fromkeys(
+        [c["product_id"] for c in campaigns] + list(top_ids) + list(new_ids)
+    ))
+
+    products = {}
+
+    if ids:
+        for p in apply_campaign_discounts(list(mongo.db.products.find({"_id": {"$in": ids}}, PRODUCT_PRIVATE_FIELDS))):
+            products[p["_id"]] = p
+            p["category"] = category_cache.name(p.get("category_id"))
+
+    return {
+        "featured": [
+            {**products[c["product_id"]], "campaign_end": c["end"]}
+            for c in campaigns if c["product_id"] in products
+        ],
+        "top_selling": [
+            {**products[pid], "total_sold": products[pid].get("sales_count", 0)}
+            for pid in top_ids if pid in products
+        ],
+        "new_arrivals": [
+            products[pid] for pid in new_ids if pid in products
+        ]
+    }
+
+def _featured_feed():
+    return _build_feeds(campaigns=_live_campaigns(datetime.utcnow()))["featured"]
+
+def _top_selling_feed():
+    return _build_feeds(top_ids=_product_ids_by("sales_count"))["top_selling"]
+
+def _new_arrivals_feed():
+    return _build_feeds(new_ids=_product_ids_by("created_at"))["new_arrivals"]
+
+def _home_feed():
+    now = datetime.utcnow()
 
-        p["_id"] = str(p["_id"])
-        p["category"] = category["name"] if category else ""
-        p["campaign_end"] = c["end"].isoformat()
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        campaigns = pool.submit(_live_campaigns, now)
+        top_ids = pool.submit(_product_ids_by, "sales_count")
+        new_ids = pool.submit(_product_ids_by, "created_at")
 
-        products.append(p)
+        return _build_feeds(campaigns.result(), top_ids.result(), new_ids.result())
 
-    return jsonify(products)
+@product_bp.route("/home", methods=["GET"])
+@catalog_conditional
+def get_home_feed():
+    return jsonify(cached_feed("home", _home_feed)), 200
+
+@product_bp.route("/featured", methods=["GET"])
+@catalog_conditional
+def get_featured_products():
+    return jsonify(cached_feed("featured", _featured_feed))
 
 @product_bp.route("/top-selling", methods=["GET"])
+@catalog_conditional
 def get_top_selling():
-    products = list(
-        mongo.db.products.find()
-        .sort("sales_count", -1)
-        .limit(8)
-    )
-
-    result = []
-    for product in products:
-
-        product = apply_campaign_discount(product)
-
-        category = mongo.db.category.find_one(
-            {"_id": product.get("category_id")}
-        )
-
-        product["_id"] = str(product["_id"])
-        product["category"] = category["name"] if category else ""
-
-        product["total_sold"] = product.get("sales_count", 0)
-
-        result.append(product)
-
-    return jsonify(result), 200
+    return jsonify(cached_feed("top_selling", _top_selling_feed)), 200
 
 @product_bp.route("/new-arrivals", methods=["GET"])
+@catalog_conditional
 def get_new_arrivals():
-    products = list(
-        mongo.db.products.find()
-        .sort("created_at", -1)
-        .limit(8)
-    )
-
-    for p in products:
-        p = apply_campaign_discount(p)
-        p["_id"] = str(p["_id"])
-
-        category = mongo.db.category.find_one(
-            {"_id": p.get("category_id")}
-        )
-
-        p["category"] = category["name"] if category else ""
-
-    return jsonify(products), 200
+    return jsonify(cached_feed("new_arrivals", _new_arrivals_feed)), 200
@@ -0,0 +1,119 @@
+from datetime import datetime
+from collections import Counter
+from itertools import permutations
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from extension import mongo
+from routes.order_archive import find_orders
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_NEIGHBORS = 12
+
+def _order_product_ids(order):
+    return list(dict.fromkeys(
+        ObjectId(item["product_id"]) for item in order.get("items", [])
+    ))
+
+def ensure_copurchase_indexes(collection):
+    collection.create_index([("product_id", 1), ("neighbor_id", 1)], unique=True)
+    collection.create_index([("product_id", 1), ("count", -1)])
+
+def _store_neighbors(product_ids, counts=None, target=None):
+    # neighbors are re-derived from the pair counts for just the products
+    # whose counts moved, in one aggregate for the whole set; $topN keeps
+    # each group at MAX_NEIGHBORS however many pairs a product has
+    counts = counts if counts is not None else mongo.db.copurchase_counts
+    target = target if target is not None else mongo.db.recommendations
+    now = datetime.utcnow()
+
+    top = counts.aggregate([
+        {"$match": {"product_id": {"$in": list(product_ids)}}},
+        {
+            "$group": {
+                "_id": "$product_id",
+                "neighbors": {
+                    "$topN": {
+                        "n": MAX_NEIGHBORS,
+                        "sortBy": {"count": -1},
+                        "output": "$neighbor_id"
+                    }
+                }
+            }
+        }
+    ])
+
+    updates = [
+        UpdateOne(
+            {"_id": row["_id"]},
+            {"$set": {"neighbors": row["neighbors"], "updated_at": now}},
+            upsert=True
+        )
+        for row in top
+    ]
+
+    if updates:
+        target.bulk_write(updates, ordered=False)
+
+def record_copurchases(*orders):
+    # recommendations are derived data that a rebuild can always restore, so
+    # a failure here is logged rather than failing the order update
+    try:
+        _record_copurchases(orders)
+    except Exception:
+        logger.exception("Recording co-purchases failed")
+
+def _record_copurchases(orders):
+    pairs = Counter()
+
+    for order in orders:
+        pairs.update(permutations(_order_product_ids(order), 2))
+
+    if not pairs:
+        return
+
+    mongo.db.copurchase_counts.bulk_write([
+        UpdateOne(
+            {"product_id": a, "neighbor_id": b},
+            {"$inc": {"count": count}},
+            upsert=True
+        )
+        for (a, b), count in pairs.items()
+    ], ordered=False)
+
+    _store_neighbors({a for a, _ in pairs})
+
+def rebuild_recommendations():
+    # built into side collections and renamed over the live ones, so /related
+    # keeps serving the old neighbors until the new set is complete
+    pairs = Counter()
+
+    for order in find_orders({"status": "Delivered"}, {"items.product_id": 1}):
+        pairs.update(permutations(_order_product_ids(order), 2))
+
+    counts = mongo.db.copurchase_counts_rebuild
+    target = mongo.db.recommendations_rebuild
+
+    counts.drop()
+    target.drop()
+    ensure_copurchase_indexes(counts)
+
+    if pairs:
+        counts.insert_many([
+            {"product_id": a, "neighbor_id": b, "count": count}
+            for (a, b), count in pairs.items()
+        ])
+
+    _store_neighbors({a for a, _ in pairs}, counts, target)
+
+    counts.rename("copurchase_counts", dropTarget=True)
+
+    if pairs:
+        target.rename("recommendations", dropTarget=True)
+    else:
+        mongo.db.recommendations.delete_many({})
+
+def related_product_ids(product_id):
+    doc = mongo.db.recommendations.find_one({"_id": product_id}, {"neighbors": 1})
+    return doc.get("neighbors", []) if doc else []
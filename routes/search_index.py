@@ -0,0 +1,315 @@
+from bisect import bisect_left, insort
+from collections import Counter
+from extension import mongo
+from routes.category_cache import category_cache
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_TTL = 300
+SEARCH_INDEX_WAIT_TIMEOUT = 30
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+MAX_PREFIX_EXPANSIONS = 50
+
+FIELD_WEIGHTS = {
+    "name": 3,
+    "category": 2,
+    "specs": 1,
+    "description": 1
+}
+
+STOP_WORDS = {"a", "an", "and", "for", "in", "of", "on", "or", "the", "to", "with"}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+SEARCH_FIELDS = {
+    "name": 1,
+    "description": 1,
+    "specs": 1,
+    "category_id": 1
+}
+
+def tokenize(text):
+    if not text:
+        return []
+
+    return [t for t in TOKEN_RE.findall(str(text).lower()) if t not in STOP_WORDS]
+
+class ProductSearchIndex:
+    # weighted-field BM25 over product name, category, spec values and
+    # description; writes in this process are applied immediately and the
+    # whole index reloads every `ttl` seconds so other workers converge.
+    # Reloads build a fresh index outside the lock and swap it in, so
+    # searches keep using the old one meanwhile
+    def __init__(self, ttl=SEARCH_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._stale = False
+        self._building = None
+        self._pending = None
+        self._reset()
+
+    def _reset(self):
+        self._postings = {}
+        self._terms = []
+        self._doc_terms = {}
+        self._doc_len = {}
+        self._doc_category = {}
+        self._total_len = 0
+
+    def refresh(self):
+        with self._lock:
+            event = self._building
+            leader = event is None
+
+            if leader:
+                event = self._building = threading.Event()
+                self._pending = []
+                self._stale = False
+
+        # one rebuild at a time; anyone else just waits for it
+        if not leader:
+            event.wait(SEARCH_INDEX_WAIT_TIMEOUT)
+            return
+
+        try:
+            fresh = ProductSearchIndex(self.ttl)
+
+            for product in mongo.db.products.find({}, SEARCH_FIELDS):
+                fresh._add(product, category_cache.name(product.get("category_id")))
+
+            with self._lock:
+                # writes that landed while the scan was running may not be
+                # in it, so they are replayed on top
+                for op, args in self._pending:
+                    getattr(fresh, op)(*args)
+
+                self._postings = fresh._postings
+                self._terms = fresh._terms
+                self._doc_terms = fresh._doc_terms
+                self._doc_len = fresh._doc_len
+                self._doc_category = fresh._doc_category
+                self._total_len = fresh._total_len
+                self._loaded_at = time.monotonic()
+        except Exception:
+            self._stale = True
+            raise
+        finally:
+            with self._lock:
+                self._building = None
+                self._pending = None
+
+            event.set()
+
+    def _refresh_in_background(self):
+        def run():
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Search index rebuild failed")
+
+        if self._building is None:
+            threading.Thread(target=run, daemon=True).start()
+
+    def _ensure_fresh(self):
+        loaded_at = self._loaded_at
+
+        # only the very first load makes searches wait; after that a stale
+        # index keeps answering while the new one is built
+        if loaded_at is None:
+            self.refresh()
+        elif self._stale or time.monotonic() - loaded_at > self.ttl:
+            self._refresh_in_background()
+
+    def invalidate(self):
+        self._stale = True
+
+    def _document_terms(self, product, category_name):
+        specs = product.get("specs") or []
+
+        fields = {
+            "name": product.get("name"),
+            "category": category_name,
+            "specs": " ".join(str(s.get("value", "")) for s in specs if isinstance(s, dict)),
+            "description": product.get("description")
+        }
+
+        terms = Counter()
+
+        for field, text in fields.items():
+            for token in tokenize(text):
+                terms[token] += FIELD_WEIGHTS[field]
+
+        return terms
+
+    def _add(self, product, category_name):
+        doc_id = product["_id"]
+        terms = self._document_terms(product, category_name)
+
+        for term, tf in terms.items():
+            postings = self._postings.get(term)
+
+            if postings is None:
+                postings = self._postings[term] = {}
+                insort(self._terms, term)
+
+            postings[doc_id] = tf
+
+        length = sum(terms.values())
+
+        self._doc_terms[doc_id] = list(terms)
+        self._doc_len[doc_id] = length
+        self._doc_category[doc_id] = product.get("category_id")
+        self._total_len += length
+
+    def _remove(self, doc_id):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+
+            postings.pop(doc_id, None)
+
+            if not postings:
+                del self._postings[term]
+                i = bisect_left(self._terms, term)
+                if i < len(self._terms) and self._terms[i] == term:
+                    del self._terms[i]
+
+        self._total_len -= self._doc_len.pop(doc_id, 0)
+        self._doc_category.pop(doc_id, None)
+
+    def _upsert(self, product, category_name):
+        self._remove(product["_id"])
+        self._add(product, category_name)
+
+    def upsert(self, product, category_name):
+        with self._lock:
+            if self._loaded_at is None and self._pending is None:
+                return
+
+            self._upsert(product, category_name)
+
+            if self._pending is not None:
+                self._pending.append(("_upsert", (product, category_name)))
+
+    def remove(self, doc_id):
+        with self._lock:
+            if self._loaded_at is None and self._pending is None:
+                return
+
+            self._remove(doc_id)
+
+            if self._pending is not None:
+                self._pending.append(("_remove", (doc_id,)))
+
+    def _expand(self, token, prefix):
+        if token in self._postings:
+            expansions = [token]
+        else:
+            expansions = []
+
+        if not prefix:
+            return expansions
+
+        i = bisect_left(self._terms, token)
+
+        while i < len(self._terms) and len(expansions) < MAX_PREFIX_EXPANSIONS:
+            term = self._terms[i]
+
+            if not term.startswith(token):
+                break
+
+            if term != token:
+                expansions.append(term)
+
+            i += 1
+
+        return expansions
+
+    def search(self, query, limit=20, category_id=None):
+        self._ensure_fresh()
+
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            doc_count = len(self._doc_len)
+            if not doc_count:
+                return []
+
+            doc_len = self._doc_len
+            len_scale = BM25_K1 * BM25_B / (self._total_len / doc_count)
+            len_base = BM25_K1 * (1 - BM25_B)
+            scores = None
+
+            # only the last token is still being typed, so only it is
+            # expanded to the terms it prefixes
+            expanded = [
+                self._expand(token, position == len(tokens) - 1)
+                for position, token in enumerate(tokens)
+            ]
+
+            # rarest tokens first so later ones only score surviving candidates
+            order = sorted(
+                range(len(tokens)),
+                key=lambda i: sum(len(self._postings[t]) for t in expanded[i])
+            )
+
+            for i in order:
+                token = tokens[i]
+                token_scores = {}
+
+                for term in expanded[i]:
+                    postings = self._postings[term]
+                    idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+
+                    # prefix matches rank below whole-word matches
+                    weight = (1.0 if term == token else 0.8) * idf * (BM25_K1 + 1)
+
+                    if scores is not None and len(scores) < len(postings):
+                        matches = ((d, postings[d]) for d in scores if d in postings)
+                    else:
+                        matches = postings.items()
+
+                    for doc_id, tf in matches:
+                        score = weight * tf / (tf + len_base + len_scale * doc_len[doc_id])
+
+                        if score > token_scores.get(doc_id, 0):
+                            token_scores[doc_id] = score
+
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {
+                        doc_id: score + token_scores[doc_id]
+                        for doc_id, score in scores.items()
+                        if doc_id in token_scores
+                    }
+
+                if not scores:
+                    return []
+
+            if category_id is not None:
+                scores = {
+                    doc_id: score for doc_id, score in scores.items()
+                    if self._doc_category.get(doc_id) == category_id
+                }
+
+            return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+product_search_index = ProductSearchIndex()
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, session
 from extension import mongo
 from utils import login_user, logout_user, login_required
+from routes.orders import user_order_summary
+from routes.order_archive import find_orders, count_orders
 import bcrypt
 from bson.objectid import ObjectId
 from datetime import datetime
@@ -80,7 +82,8 @@ def profile():
     user_id = session.get("user_id")
 
     user = mongo.db.users.find_one(
-        {"_id": ObjectId(user_id)}
+        {"_id": ObjectId(user_id)},
+        {"password": 0}
     )
 
     if not user:
@@ -88,36 +91,11 @@ def profile():
         return jsonify({"message": "Unauthorized"}), 401
 
     orders = []
-    for o in mongo.db.orders.find({"user_id": ObjectId(user_id)}):
-
-        order_total = sum(
-            (item.get("price_at_purchase") or item.get("price", 0)) * item["qty"]
-            for item in o["items"]
-        )
-        total_items = o.get("total_items") or sum(item["qty"] for item in o["items"])
-
-        orders.append({
-            "id": str(o["_id"]),
-            "order_number": o.get("order_number", str(o["_id"])),
-            "created_at": o["created_at"].isoformat(),
-            "order_total": order_total,
-            "grand_total": o.get("grand_total", order_total),
-            "total_items": total_items,
-            "status": o["status"],
-            "items": o["items"],
-        })
-
-    user["_id"] = str(user["_id"])
+    for o in find_orders({"user_id": ObjectId(user_id)}):
+        orders.append(user_order_summary(o))
 
     membership = user.get("membership", {})
 
-    if membership:
-        if membership.get("expires_at"):
-            membership["expires_at"] = membership["expires_at"].isoformat()
-
-        if membership.get("purchased_at"):
-            membership["purchased_at"] = membership["purchased_at"].isoformat()
-
     return jsonify({
         "user": user,
         "membership": membership,
@@ -131,7 +109,7 @@ def get_all_users():
 
     for user in mongo.db.users.find({}):
 
-        order_count = mongo.db.orders.count_documents({
+        order_count = count_orders({
             "user_id": user["_id"]
         })
 
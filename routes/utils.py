@@ -1,7 +1,14 @@
-from datetime import datetime, timedelta
-from flask import request, session
+from datetime import datetime
+from functools import wraps
+from flask import request, make_response, g
+from utils import get_user_context
+from routes.campaign_index import campaign_index
+from routes.versions import read_versions
+from routes.feed_cache import feed_cache
+import hashlib
+from bson import json_util
 from bson.objectid import ObjectId
-from extension import mongo
+import base64
 import re
 
 def title_case(text):
@@ -40,24 +47,95 @@ def parse_date_range():
         }
     }
 
-def apply_campaign_discount(product):
+def encode_cursor(value, last_id):
+    raw = json_util.dumps({"v": value, "id": last_id})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+CURSOR_VALUE_TYPES = (datetime, int, float, str)
+
+def decode_cursor(token):
+    try:
+        data = json_util.loads(base64.urlsafe_b64decode(token.encode()))
+        value, last_id = data["v"], data["id"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    # both parts go straight into the query, so anything that could carry
+    # an operator (a dict, a list) is rejected
+    if value is not None and (isinstance(value, bool) or not isinstance(value, CURSOR_VALUE_TYPES)):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(last_id, ObjectId):
+        raise ValueError("Invalid cursor")
+
+    return value, last_id
+
+def keyset_after(sort_key, direction, value, last_id):
+    op = "$lt" if direction < 0 else "$gt"
+
+    if value is None:
+        if direction < 0:
+            return {sort_key: None, "_id": {op: last_id}}
 
+        return {
+            "$or": [
+                {sort_key: None, "_id": {op: last_id}},
+                {sort_key: {"$ne": None}}
+            ]
+        }
+
+    clauses = [
+        {sort_key: {op: value}},
+        {sort_key: value, "_id": {op: last_id}}
+    ]
+
+    if direction < 0:
+        clauses.append({sort_key: None})
+
+    return {"$or": clauses}
+
+def final_price_filter(min_price=None, max_price=None):
     now = datetime.utcnow()
+    member = get_user_context()
+    member_factor = 1 - member.member_discount / 100
 
-    user_id = session.get("user_id")
-    membership = None
+    def price_range(factor):
+        bounds = {}
 
-    if user_id:
-        user = mongo.db.users.find_one(
-            {"_id": ObjectId(user_id)},
-            {"membership": 1}
-        )
-        membership = user.get("membership") if user else None
+        if min_price is not None:
+            bounds["$gte"] = min_price / factor
 
-    campaign = mongo.db.campaigns.find_one({
-        "product_id": product["_id"],
-        "end": {"$gte": now}
-    })
+        if max_price is not None:
+            bounds["$lte"] = max_price / factor
+
+        return bounds
+
+    by_discount = {}
+
+    for product_id, campaign in campaign_index.visible(now, member.early_campaign_hours).items():
+        discount = float(campaign.get("discount_percent", 0))
+
+        if discount > 0:
+            by_discount.setdefault(discount, []).append(product_id)
+
+    discounted_ids = [pid for ids in by_discount.values() for pid in ids]
+
+    clauses = [{"price": price_range(member_factor)}]
+
+    if discounted_ids:
+        clauses[0]["_id"] = {"$nin": discounted_ids}
+
+    for discount, ids in by_discount.items():
+        factor = member_factor * (1 - discount / 100)
+
+        if factor > 0:
+            clauses.append({"_id": {"$in": ids}, "price": price_range(factor)})
+        elif (min_price or 0) <= 0:
+            clauses.append({"_id": {"$in": ids}})
+
+    return {"$or": clauses} if len(clauses) > 1 else clauses[0]
+
+def price_product(product, campaign, member):
 
     original_price = float(product["price"])
 
@@ -69,59 +147,164 @@ def apply_campaign_discount(product):
 
     if campaign:
 
-        start_time = campaign["start"]
+        discount = float(campaign.get("discount_percent", 0))
+
+        if discount > 0:
+            offer_price = round(
+                original_price * (1 - discount / 100),
+                2
+            )
+
+            product["offer_price"] = offer_price
+            product["final_price"] = offer_price
+            product["discount_percent"] = discount
+            product["is_discount_active"] = True
+
+    if member.member_discount > 0:
+        product["final_price"] = round(
+            product["final_price"] * (1 - member.member_discount / 100),
+            2
+        )
+
+        product["member_discount"] = member.member_discount
+        product["membership_plan"] = member.membership_plan
+
+    return product
+
+def price_delta(product, campaign):
+    return {
+        "product_id": product["_id"],
+        "final_price": product["final_price"],
+        "offer_price": product["offer_price"],
+        "original_price": product["original_price"],
+        "discount_percent": product["discount_percent"],
+        "is_discount_active": product["is_discount_active"],
+        "member_discount": product.get("member_discount", 0),
+        "membership_plan": product.get("membership_plan", ""),
+        "campaign_end": campaign["end"] if campaign else None
+    }
+
+def apply_campaign_discounts(products):
+
+    products = [p for p in products if p]
+
+    if not products:
+        return products
+
+    now = datetime.utcnow()
+    member = get_user_context()
+    early_hours = member.early_campaign_hours
+
+    for product in products:
+        price_product(
+            product,
+            campaign_index.effective(product["_id"], now, early_hours),
+            member
+        )
+
+    return products
+
+def pricing_key(member):
+    # the inputs price_product actually uses, taken from the member's stored
+    # membership; anything priced per caller is shared only under this key
+    return (member.membership_plan, member.member_discount, member.early_campaign_hours)
 
-        early_hours = 0
+def catalog_versions():
+    versions = g.get("catalog_versions")
 
-        if membership:
-            expiry = membership.get("expires_at")
+    if versions is None:
+        versions = read_versions("catalog", "campaign", "category")
+        g.catalog_versions = versions
 
-            if expiry and expiry > now:
-                early_hours = membership.get("early_campaign_hours", 0)
+        # ETags and cached feeds are keyed on these versions, so they must
+        # never be built from a campaign index older than them
+        campaign_index.ensure_version(versions[1])
 
-        campaign_visible = False
+    return versions
 
-        if now >= start_time:
-            campaign_visible = True
+def catalog_etag():
+    now = datetime.utcnow()
+    member = get_user_context()
+
+    boundary = campaign_index.last_boundary(now, member.early_campaign_hours)
+
+    key = "|".join(str(part) for part in (
+        *catalog_versions(),
+        boundary.isoformat() if boundary else "",
+        *pricing_key(member)
+    ))
+
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def catalog_conditional(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        etag = catalog_etag()
+
+        if request.if_none_match.contains(etag):
+            response = make_response("", 304)
         else:
-            if early_hours > 0:
-                early_start = start_time - timedelta(hours=early_hours)
-                if now >= early_start:
-                    campaign_visible = True
+            response = make_response(fn(*args, **kwargs))
 
-        if campaign_visible:
+            if response.status_code != 200:
+                return response
 
-            discount = float(campaign.get("discount_percent", 0))
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.vary.add("Cookie")
 
-            if discount > 0:
-                offer_price = round(
-                    original_price * (1 - discount / 100),
-                    2
-                )
+        return response
 
-                product["offer_price"] = offer_price
-                product["final_price"] = offer_price
-                product["discount_percent"] = discount
-                product["is_discount_active"] = True
+    return wrapper
 
-    if membership:
+def cached_feed(name, compute):
+    member = get_user_context()
 
-        expiry = membership.get("expires_at")
+    return feed_cache.get(
+        (name, pricing_key(member)),
+        catalog_versions(),
+        campaign_index.next_boundary(datetime.utcnow(), member.early_campaign_hours),
+        compute
+    )
 
-        if expiry and expiry > now:
+def apply_campaign_discount(product):
+    if not product:
+        return product
 
-            discount = float(membership.get("discount", 0))
+    return apply_campaign_discounts([product])[0]
 
-            if discount > 0:
-                product["final_price"] = round(
-                    product["final_price"] * (1 - discount / 100),
-                    2
-                )
+def cart_line(product, qty):
+    # splits a priced product's line into list price, campaign savings and
+    # member savings, the same breakdown the cart summary shows
+    base_price = product.get("original_price") or product.get("price") or 0
+    campaign_price = product.get("offer_price") or base_price
+    final_price = product.get("final_price") or campaign_price
 
-                product["member_discount"] = discount
-                product["membership_plan"] = membership.get("plan")
+    return {
+        "line_subtotal": round(base_price * qty, 2),
+        "campaign_saved": round((base_price - campaign_price) * qty, 2) if product.get("discount_percent") else 0,
+        "membership_saved": round((campaign_price - final_price) * qty, 2) if product.get("member_discount") else 0,
+        "line_total": round(final_price * qty, 2)
+    }
 
-    return product
+def cart_totals(lines, free_shipping):
+    subtotal = round(sum(line["line_subtotal"] for line in lines), 2)
+    campaign_savings = round(sum(line["campaign_saved"] for line in lines), 2)
+    membership_savings = round(sum(line["membership_saved"] for line in lines), 2)
+    total = round(sum(line["line_total"] for line in lines), 2)
+
+    shipping_cost = 0 if free_shipping or not lines else SHIPPING_COST
+
+    return {
+        "subtotal": subtotal,
+        "campaign_savings": campaign_savings,
+        "membership_savings": membership_savings,
+        "savings": round(campaign_savings + membership_savings, 2),
+        "total": total,
+        "shipping_cost": shipping_cost,
+        "original_shipping_cost": SHIPPING_COST,
+        "grand_total": round(total + shipping_cost, 2)
+    }
 
 MEMBERSHIP_PLANS = {
     "silver": {
@@ -146,3 +329,5 @@ MEMBERSHIP_PLANS = {
         "early_campaign_hours": 12
     }
 }
+
+SHIPPING_COST = 1000
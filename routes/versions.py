@@ -0,0 +1,62 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from extension import mongo
+from pymongo import ReturnDocument
+
+REVISION_LEASE_TIMEOUT = 30
+
+def read_version(name):
+    doc = mongo.db.cache_versions.find_one({"_id": name})
+    return doc["version"] if doc else 0
+
+def read_versions(*names):
+    versions = {
+        doc["_id"]: doc["version"]
+        for doc in mongo.db.cache_versions.find({"_id": {"$in": list(names)}})
+    }
+    return tuple(versions.get(name, 0) for name in names)
+
+def bump_version(name):
+    doc = mongo.db.cache_versions.find_one_and_update(
+        {"_id": name},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
+
+@contextmanager
+def product_revision():
+    # a revision is taken before the write that carries it, so writers can
+    # commit out of order. Each one holds a lease floored at the revision
+    # it started from until its write is done, and readers never sync past
+    # the lowest open floor
+    lease = mongo.db.revision_leases.insert_one({
+        "floor": read_version("product_revision"),
+        "started_at": datetime.utcnow()
+    }).inserted_id
+
+    try:
+        yield bump_version("product_revision")
+    finally:
+        mongo.db.revision_leases.delete_one({"_id": lease})
+
+def product_revision_high_water():
+    # the counter is read before the leases: any revision at or below it
+    # was taken by a writer whose lease is already visible
+    revision = read_version("product_revision")
+    cutoff = datetime.utcnow() - timedelta(seconds=REVISION_LEASE_TIMEOUT)
+
+    for lease in mongo.db.revision_leases.find({"started_at": {"$gte": cutoff}}, {"floor": 1}):
+        revision = min(revision, lease["floor"])
+
+    return revision
+
+def touch_products(product_ids):
+    with product_revision() as revision:
+        mongo.db.products.update_many(
+            {"_id": {"$in": list(product_ids)}},
+            {"$set": {"revision": revision, "updated_at": datetime.utcnow()}}
+        )
+
+    return revision
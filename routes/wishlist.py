@@ -3,7 +3,7 @@ from bson.objectid import ObjectId
 from extension import mongo
 from utils import login_required
 from datetime import datetime
-from routes.utils import apply_campaign_discount
+from routes.utils import apply_campaign_discounts
 
 wishlist_bp = Blueprint("wishlist", __name__, url_prefix="/api/users/wishlist")
 
@@ -28,13 +28,9 @@ def get_wishlist():
     data = list(mongo.db.wishlists.aggregate(pipeline))
 
     products = []
-    for w in data:
-        p = w["product"]
-
-        p = apply_campaign_discount(p)
-
+    for p in apply_campaign_discounts([w["product"] for w in data]):
         products.append({
-            "id": str(p["_id"]),
+            "id": p["_id"],
             "name": p.get("name"),
             "price": p.get("price"),
             "offer_price": p.get("offer_price"),
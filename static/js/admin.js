@@ -1,6 +1,5 @@
 let cachedUsers = [];
 let cachedOrders = [];
-let lastOrderUpdate = null;
 let lastOrderCount = 0;
 let pendingNewOrders = 0;
 let usersNeedReload = false;
@@ -60,8 +59,28 @@ function renderUsersTable(users) {
 }
 
 // LOAD & RENDER ORDERS
+const ORDER_PAGE_SIZE = 20;
+let ordersNextCursor = null;
+
+function adminOrdersURL(cursor = null, limit = ORDER_PAGE_SIZE) {
+  const params = new URLSearchParams({ limit });
+
+  const status = document.getElementById("orderStatusFilter")?.value;
+  const category = document.getElementById("orderCategoryFilter")?.value;
+  const start = document.getElementById("orderStartDate")?.value;
+  const end = document.getElementById("orderEndDate")?.value;
+
+  if (status && status !== "All") params.set("status", status);
+  if (category && category !== "All") params.set("category", category);
+  if (start) params.set("start", `${start}T00:00:00`);
+  if (end) params.set("end", `${end}T23:59:59`);
+  if (cursor) params.set("cursor", cursor);
+
+  return `/api/orders/all?${params}`;
+}
+
 function loadOrders() {
-  fetch("/api/orders/all", {
+  fetch(adminOrdersURL(), {
     credentials: "include"
   })
   .then(res => res.json())
@@ -69,19 +88,47 @@ function loadOrders() {
     const ordersDiv = document.getElementById("adminOrders");
     if (!ordersDiv) return;
 
-    if (!data.orders || !data.orders.length) {
-      ordersDiv.innerHTML = "<p>No orders available</p>";
-      return;
+    const select = document.getElementById("orderCategoryFilter");
+    if (select && select.options.length <= 1) {
+      populateOrderCategoryFilter();
     }
 
-    cachedOrders = sortOrdersByDate(data.orders);
-    lastOrderCount = cachedOrders.length;
-    populateOrderCategoryFilter(); 
+    cachedOrders = data.orders || [];
+    ordersNextCursor = data.next_cursor;
+
     renderOrders(cachedOrders);
-    updateOrderCount(cachedOrders);
+    updateOrderCount(data.total ?? cachedOrders.length);
+    updateLoadMoreOrdersButton();
   });
 }
 
+function loadMoreOrders() {
+  if (!ordersNextCursor) return;
+
+  fetch(adminOrdersURL(ordersNextCursor), { credentials: "include" })
+    .then(res => res.json())
+    .then(data => {
+      cachedOrders = cachedOrders.concat(data.orders || []);
+      ordersNextCursor = data.next_cursor;
+
+      renderOrders(cachedOrders);
+      updateLoadMoreOrdersButton();
+    });
+}
+
+function updateLoadMoreOrdersButton() {
+  const btn = document.getElementById("loadMoreOrders");
+  if (!btn) return;
+
+  btn.classList.toggle("hidden", !ordersNextCursor);
+}
+
+function fetchOrderTotal() {
+  return fetch("/api/orders/all?limit=1", { credentials: "include" })
+    .then(res => res.json())
+    .then(data => data.total || 0);
+}
+
 function renderOrders(orders) {
   const ordersDiv = document.getElementById("adminOrders");
   if (!ordersDiv) return;
@@ -97,7 +144,12 @@ function renderOrders(orders) {
       <div class="admin-order-left">
         <div class="admin-order-meta">
           <div class="order-header-top">
-            <span class="order-id">${order.order_number}</span>
+            <span class="order-id">
+              ${LOCKED_ORDER_STATUSES.includes(order.status) ? "" : `
+                <input type="checkbox" class="order-select" value="${order.id}">
+              `}
+              ${order.order_number}
+            </span>
             <span class="order-date">
               ${new Date(order.created_at).toLocaleDateString("en-IN", {
                 day: "2-digit",
@@ -152,19 +204,15 @@ function filterOrdersByStatus() {
   filterOrdersByCategory();
 }
 
-function updateOrderCount(orders) {
+function updateOrderCount(total) {
   const el = document.getElementById("orderCount");
   if (!el) return;
-  el.innerText = `Order(s) Found: ${orders.length}`;
-}
-
-function sortOrdersByDate(orders) {
-  return [...orders].sort(
-    (a, b) => new Date(b.created_at) - new Date(a.created_at)
-  );
+  el.innerText = `Order(s) Found: ${total}`;
 }
 
 // ORDER STATUS CONTROL & UPDATE
+const LOCKED_ORDER_STATUSES = ["Delivered", "Rejected", "Cancelled"];
+
 function renderAdminStatusControl(order) {
   const STATUS_FLOW = {
     "Pending": ["Approved", "Rejected"],
@@ -182,7 +230,7 @@ function renderAdminStatusControl(order) {
     "Rejected"
   ];
 
-  if (["Delivered", "Rejected", "Cancelled"].includes(order.status)) {
+  if (LOCKED_ORDER_STATUSES.includes(order.status)) {
     return `
       <span class="order-status-badge ${order.status.toLowerCase().replace(/\s/g, "-")}">
         ${order.status}
@@ -213,26 +261,8 @@ function renderAdminStatusControl(order) {
 }
 
 function filterOrdersByCategory() {
-  const selectedCategory =
-    document.getElementById("orderCategoryFilter").value;
-
-  const selectedStatus =
-    document.getElementById("orderStatusFilter").value;
-
-  let filtered = [...cachedOrders];
-
-  if (selectedStatus !== "All") {
-    filtered = filtered.filter(o => o.status === selectedStatus);
-  }
-
-  if (selectedCategory !== "All") {
-    filtered = filtered.filter(order =>
-      order.items.some(item => item.category === selectedCategory)
-    );
-  }
-
-  renderOrders(filtered);
-  updateOrderCount(filtered);
+  // filters are applied server-side
+  loadOrders();
   updateResetButtonVisibility("ordersSection");
 }
 
@@ -266,80 +296,119 @@ function updateOrderStatus(orderId, status) {
   })
   .then(() => {
     loadOrders();
-    setTimeout(filterOrdersByCategory, 50);
   });
 }
 
-function checkAdminOrderChanges() {
-  fetch("/api/orders/last-update", { credentials: "include" })
-    .then(res => res.json())
-    .then(data => {
+function toggleAllOrders(checked) {
+  document.querySelectorAll(".order-select").forEach(box => {
+    box.checked = checked;
+  });
+}
 
-      if (!lastOrderUpdate) {
-        lastOrderUpdate = data.last_update;
-        return;
-      }
+function applyBulkOrderStatus() {
+  const orderIds = [...document.querySelectorAll(".order-select:checked")]
+    .map(box => box.value);
+  const status = document.getElementById("bulkOrderStatus")?.value;
 
-      if (data.last_update !== lastOrderUpdate) {
-        lastOrderUpdate = data.last_update;
+  if (!orderIds.length) {
+    showToast("Select orders to update", "info");
+    return;
+  }
 
-        fetch("/api/orders/all", { credentials: "include" })
-          .then(res => res.json())
-          .then(newData => {
+  fetch("/api/orders/update-status", {
+    method: "PUT",
+    credentials: "include",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ order_ids: orderIds, status })
+  })
+  .then(res => res.json())
+  .then(data => {
+    const updated = (data.updated || []).length;
+    const failed = (data.failed || []).length;
+
+    showToast(
+      failed
+        ? `${updated} order(s) updated, ${failed} skipped`
+        : `${updated} order(s) updated`,
+      failed ? "info" : "success"
+    );
 
-            const newCount = (newData.orders || []).length;
+    const selectAll = document.getElementById("selectAllOrders");
+    if (selectAll) selectAll.checked = false;
 
-            const lastSeen = parseInt(
-              sessionStorage.getItem("adminLastSeenOrderCount") || 0
-            );
+    loadOrders();
+  });
+}
 
-            if (newCount > lastSeen) {
+function startAdminOrderStream() {
+  if (!window.EventSource) return;
 
-              pendingNewOrders = newCount - lastSeen;
-              ordersNeedReload = true;
-              usersNeedReload = true;
+  const source = new EventSource("/api/orders/stream");
+  let connected = false;
 
-              const ordersTabVisible =
-                !document.getElementById("ordersSection")
-                  ?.classList.contains("hidden");
+  // events sent while the stream was down are not replayed, so a
+  // reconnect reloads whatever they could have changed
+  source.onopen = () => {
+    if (connected) {
+      const ordersTabVisible =
+        !document.getElementById("ordersSection")
+          ?.classList.contains("hidden");
 
-              const usersTabVisible =
-                !document.getElementById("usersSection")
-                  ?.classList.contains("hidden");
+      if (ordersTabVisible) {
+        loadOrders();
+      } else {
+        ordersNeedReload = true;
+      }
+
+      usersNeedReload = true;
+    }
 
-              if (ordersTabVisible) {
+    connected = true;
+  };
 
-                loadOrders();
+  source.addEventListener("order", event => {
+    const { type, order } = JSON.parse(event.data);
 
-                if (pendingNewOrders === 1) {
-                  showToast("New Order Received", "info");
-                } else {
-                  showToast("New Orders Received", "info");
-                }
+    const ordersTabVisible =
+      !document.getElementById("ordersSection")
+        ?.classList.contains("hidden");
 
-                sessionStorage.setItem("adminLastSeenOrderCount", newCount);
+    const usersTabVisible =
+      !document.getElementById("usersSection")
+        ?.classList.contains("hidden");
 
-                pendingNewOrders = 0;
-                ordersNeedReload = false;
-                updateOrdersBadge();
-              }
+    if (type !== "placed") {
+      const i = cachedOrders.findIndex(o => o.id === order.id);
+      if (i === -1) return;
 
-              if (usersTabVisible) {
-                loadUsers();
-                usersNeedReload = false;
-              }
+      cachedOrders[i] = order;
+      if (ordersTabVisible) renderOrders(cachedOrders);
+      return;
+    }
 
-              if (!ordersTabVisible) {
-                updateOrdersBadge();
-              }
-            }
+    lastOrderCount += 1;
+    sessionStorage.setItem("adminLastOrderCount", lastOrderCount);
 
-            lastOrderCount = newCount;
-            sessionStorage.setItem("adminLastOrderCount", newCount);
-          });
-      }
-    })
-    .catch(() => {});
+    ordersNeedReload = true;
+    usersNeedReload = true;
+
+    if (ordersTabVisible) {
+      loadOrders();
+      showToast("New Order Received", "info");
+
+      sessionStorage.setItem("adminLastSeenOrderCount", lastOrderCount);
+      ordersNeedReload = false;
+    } else {
+      pendingNewOrders += 1;
+    }
+
+    updateOrdersBadge();
+
+    if (usersTabVisible) {
+      loadUsers();
+      usersNeedReload = false;
+    }
+  });
 }
 
 function updateOrdersBadge() {
@@ -357,11 +426,8 @@ function updateOrdersBadge() {
 document.addEventListener("DOMContentLoaded", () => {
   if (location.pathname === "/admin/dashboard") {
 
-    fetch("/api/orders/all", { credentials: "include" })
-      .then(res => res.json())
-      .then(data => {
-
-        const currentCount = (data.orders || []).length;
+    fetchOrderTotal()
+      .then(currentCount => {
 
         let lastSeen = sessionStorage.getItem("adminLastSeenOrderCount");
 
@@ -386,7 +452,7 @@ document.addEventListener("DOMContentLoaded", () => {
         const tab = getTabFromURL("usersSection");
         openAdminTab(tab);
 
-        setInterval(checkAdminOrderChanges, 5000);
+        startAdminOrderStream();
       });
   }
 });
@@ -77,6 +77,119 @@ function syncCampaignPrices(products) {
   });
 }
 
+function startPriceStream() {
+  // the stream is the main path; /changes polling is only the fallback
+  // for browsers without EventSource or when the stream cannot be opened
+  if (!window.EventSource) {
+    startCatalogSync();
+    return;
+  }
+
+  const source = new EventSource("/api/products/stream");
+  let connected = false;
+
+  fetchCatalogPosition();
+
+  // deltas pushed while the stream was down are not replayed, so a
+  // reconnect catches up once through /changes
+  source.onopen = () => {
+    if (connected) pollCatalogChanges();
+    connected = true;
+  };
+
+  source.onerror = () => {
+    if (source.readyState === EventSource.CLOSED) startCatalogSync();
+  };
+
+  source.addEventListener("prices", event => {
+    applyPriceDeltas(JSON.parse(event.data));
+    loadHomeFeeds();
+  });
+}
+
+function applyPriceDeltas(deltas) {
+  const changed = [];
+
+  deltas.forEach(d => {
+    const cached = productCache.find(p => p._id === d.product_id);
+    const updated = { ...(cached || {}), ...d, _id: d.product_id };
+
+    if (cached) Object.assign(cached, updated);
+    changed.push(updated);
+  });
+
+  syncCampaignPrices(changed.filter(p => p.price !== undefined));
+}
+
+// CATALOG DELTA SYNC
+let catalogRevision = null;
+let catalogSyncedAt = null;
+
+async function fetchCatalogPosition() {
+  const res = await fetch("/api/products/changes", { credentials: "include" });
+  if (!res.ok) return;
+
+  const data = await res.json();
+  catalogRevision = data.revision;
+  catalogSyncedAt = data.synced_at;
+}
+
+async function startCatalogSync() {
+  if (catalogRevision === null) await fetchCatalogPosition();
+
+  setInterval(pollCatalogChanges, 10000);
+}
+
+async function pollCatalogChanges() {
+  if (catalogRevision === null) return;
+
+  const params = new URLSearchParams({
+    since: catalogRevision,
+    synced_at: catalogSyncedAt
+  });
+
+  const res = await fetch(`/api/products/changes?${params}`, {
+    credentials: "include"
+  });
+  if (!res.ok) return;
+
+  const data = await res.json();
+  catalogRevision = data.revision;
+  catalogSyncedAt = data.synced_at;
+
+  if (data.reset) {
+    loadProducts();
+    loadHomeFeeds();
+    return;
+  }
+
+  let dirty = false;
+
+  data.products.forEach(p => {
+    const i = productCache.findIndex(c => c._id === p._id);
+    if (i === -1) return;
+
+    productCache[i] = p;
+    dirty = true;
+  });
+
+  if (data.deleted.length) {
+    const deleted = new Set(data.deleted);
+    productCache = productCache.filter(p => !deleted.has(p._id));
+    dirty = true;
+  }
+
+  if (dirty) renderFilteredProducts();
+
+  applyPriceDeltas(data.prices);
+
+  // the home feeds are conditional requests, so only refetch them when
+  // this poll actually moved something
+  if (data.products.length || data.deleted.length || data.prices.length) {
+    loadHomeFeeds();
+  }
+}
+
 function showToast(message, type = "info", duration = 3000, persist = false) {
   if (persist) {
     sessionStorage.setItem(
@@ -360,11 +473,25 @@ document.addEventListener("click", (e) => {
 });
 
 // PRODUCTS MODULE (LOAD, RENDER)
+const PRODUCT_PAGE_SIZE = 24;
 let productCache = [];
+let productNextCursor = null;
+let productFilters = {};
+let productSearchQuery = "";
+let productSearchTimer = null;
 const imageIndexMap = {};
 
+function productListURL(cursor = null, limit = PRODUCT_PAGE_SIZE, filters = productFilters) {
+  const params = new URLSearchParams({ ...filters, limit });
+
+  if (IS_ADMIN_PRODUCTS_PAGE) params.set("fields", "full");
+  if (cursor) params.set("cursor", cursor);
+
+  return `/api/products/?${params}`;
+}
+
 function loadProducts(showAdmin = false) {
-  fetch("/api/products/", { credentials: "include" })
+  fetch(productListURL(), { credentials: "include" })
     .then(res => {
       if (res.status === 401 || res.status === 403) {
         window.location.href = "/";
@@ -375,13 +502,11 @@ function loadProducts(showAdmin = false) {
     .then(data => {
       if (!data) return;
 
-      productCache = Array.isArray(data) ? data : [];
+      productCache = Array.isArray(data.products) ? data.products : [];
+      productNextCursor = data.next_cursor || null;
 
-      renderProducts(
-        productCache,
-        IS_ADMIN_PRODUCTS_PAGE,
-        IS_DASHBOARD_PAGE && IS_ADMIN
-      );
+      renderFilteredProducts();
+      updateLoadMoreButton();
       if (!IS_ADMIN) {
         loadWishlistHearts();
       }
@@ -389,6 +514,43 @@ function loadProducts(showAdmin = false) {
     .catch(err => console.error("Failed to load products", err));
 }
 
+function loadMoreProducts() {
+  if (!productNextCursor) return;
+
+  fetch(productListURL(productNextCursor), { credentials: "include" })
+    .then(res => res.json())
+    .then(data => {
+      productCache = productCache.concat(data.products || []);
+      productNextCursor = data.next_cursor || null;
+
+      renderFilteredProducts();
+      updateLoadMoreButton();
+    })
+    .catch(err => console.error("Failed to load more products", err));
+}
+
+function updateLoadMoreButton() {
+  const btn = document.getElementById("loadMoreProducts");
+  if (!btn) return;
+
+  btn.classList.toggle("hidden", !productNextCursor);
+}
+
+async function fetchAllProducts(filters = {}) {
+  let products = [];
+  let cursor = null;
+
+  do {
+    const res = await fetch(productListURL(cursor, 100, filters), { credentials: "include" });
+    const data = await res.json();
+
+    products = products.concat(data.products || []);
+    cursor = data.next_cursor;
+  } while (cursor);
+
+  return products;
+}
+
 function renderProducts(list, showAdmin = false, isAdminView = false) {
   const container = document.getElementById("products");
   if (!container) return;
@@ -943,37 +1105,71 @@ function collectDetails() {
 }
 
 // FILTERS
-function applyFilters() {
-  const q = document.getElementById("searchInput")?.value.trim().toLowerCase() || "";
+function readProductFilters() {
+  const filters = {};
+
   const cat = document.getElementById("categoryFilter")?.value || "";
   const sort = document.getElementById("sortFilter")?.value || "";
+  const minPrice = document.getElementById("minPriceFilter")?.value || "";
+  const maxPrice = document.getElementById("maxPriceFilter")?.value || "";
+  const inStock = document.getElementById("inStockFilter")?.checked;
 
-  let filtered = [...productCache];
+  if (cat) filters.category_id = cat;
+  if (sort) filters.sort = sort;
+  if (minPrice) filters.min_price = minPrice;
+  if (maxPrice) filters.max_price = maxPrice;
+  if (inStock) filters.in_stock = 1;
 
-  if (q) {
-    filtered = filtered.filter(p =>
-      p.name.toLowerCase().includes(q) ||
-      p.description.toLowerCase().includes(q) ||
-      p.category.toLowerCase().includes(q)
-    );
-  }
-
-  if (cat) {
-    filtered = filtered.filter(p => p.category_id === cat);
-  }
-
-  if (sort === "price_asc") filtered.sort((a, b) => a.price - b.price);
-  if (sort === "price_desc") filtered.sort((a, b) => b.price - a.price);
-  if (sort === "name_asc") filtered.sort((a, b) => a.name.localeCompare(b.name));
-  if (sort === "name_desc") filtered.sort((a, b) => b.name.localeCompare(a.name));
+  return filters;
+}
 
+function renderFilteredProducts() {
   renderProducts(
-    filtered,
+    productCache,
     IS_ADMIN_PRODUCTS_PAGE,
     IS_DASHBOARD_PAGE && IS_ADMIN
   );
 
-  updateResultsCount(filtered.length, true);
+  const filtersActive = productSearchQuery || Object.keys(productFilters).length;
+  updateResultsCount(productCache.length, !!filtersActive);
+}
+
+function searchProducts(q, filters) {
+  const params = new URLSearchParams({ q, limit: 100 });
+  if (filters.category_id) params.set("category_id", filters.category_id);
+
+  fetch(`/api/products/search?${params}`, { credentials: "include" })
+    .then(res => res.json())
+    .then(data => {
+      if (q !== productSearchQuery) return;
+
+      productCache = data.products || [];
+      productNextCursor = null;
+
+      renderFilteredProducts();
+      updateLoadMoreButton();
+    })
+    .catch(err => console.error("Search failed", err));
+}
+
+function applyFilters() {
+  const q = document.getElementById("searchInput")?.value.trim() || "";
+  const filters = readProductFilters();
+
+  clearTimeout(productSearchTimer);
+
+  if (q) {
+    productFilters = filters;
+    productSearchQuery = q;
+    productSearchTimer = setTimeout(() => searchProducts(q, filters), 200);
+  } else if (productSearchQuery || JSON.stringify(filters) !== JSON.stringify(productFilters)) {
+    productFilters = filters;
+    productSearchQuery = "";
+    loadProducts();
+  } else {
+    renderFilteredProducts();
+  }
+
   updateResetButtonVisibility("mainDashboard");
 }
 
@@ -991,14 +1187,19 @@ function resetFilters(btn) {
     if (category) category.value = "";
     if (sort) sort.value = "";
 
+    ["minPriceFilter", "maxPriceFilter"].forEach(id => {
+      const input = document.getElementById(id);
+      if (input) input.value = "";
+    });
+    const inStock = document.getElementById("inStockFilter");
+    if (inStock) inStock.checked = false;
+
     document.querySelectorAll(".category-chip")
       .forEach(chip => chip.classList.remove("active"));
 
-    renderProducts(
-      productCache,
-      IS_ADMIN_PRODUCTS_PAGE,
-      IS_DASHBOARD_PAGE && IS_ADMIN
-    );
+    productFilters = {};
+    productSearchQuery = "";
+    loadProducts();
     updateResultsCount(0, false);
   }
 
@@ -1009,6 +1210,11 @@ function resetFilters(btn) {
     if (status) status.value = "All";
     if (category) category.value = "All";
 
+    ["orderStartDate", "orderEndDate"].forEach(id => {
+      const input = document.getElementById(id);
+      if (input) input.value = "";
+    });
+
     filterOrdersByCategory();
   }
 
@@ -1049,9 +1255,15 @@ function updateResetButtonVisibility(sectionId) {
       document.getElementById("categoryFilter")?.value;
     const sortVal =
       document.getElementById("sortFilter")?.value;
+    const minPriceVal =
+      document.getElementById("minPriceFilter")?.value;
+    const maxPriceVal =
+      document.getElementById("maxPriceFilter")?.value;
+    const inStockVal =
+      document.getElementById("inStockFilter")?.checked;
     const activeChip =
       document.querySelector(".category-chip.active");
-    if (searchVal || categoryVal || sortVal || activeChip) {
+    if (searchVal || categoryVal || sortVal || minPriceVal || maxPriceVal || inStockVal || activeChip) {
       hasActiveFilter = true;
     }
   }
@@ -1069,7 +1281,11 @@ function updateResetButtonVisibility(sectionId) {
       document.getElementById("orderStatusFilter")?.value;
     const category =
       document.getElementById("orderCategoryFilter")?.value;
-    if (status !== "All" || category !== "All") {
+    const start =
+      document.getElementById("orderStartDate")?.value;
+    const end =
+      document.getElementById("orderEndDate")?.value;
+    if (status !== "All" || category !== "All" || start || end) {
       hasActiveFilter = true;
     }
   }
@@ -1099,23 +1315,18 @@ function updateResultsCount(count, show = false) {
   }
 }
 
-function filterByCategory(categoryName) {
+function filterByCategory(categoryId) {
   document.querySelectorAll(".category-chip")
     .forEach(chip => chip.classList.remove("active"));
 
   event?.target?.classList.add("active");
-  
-  const filtered = productCache.filter(p =>
-    p.category?.toLowerCase().includes(categoryName.toLowerCase())
-  );
 
-  renderProducts(
-    filtered,
-    IS_ADMIN_PRODUCTS_PAGE,
-    IS_DASHBOARD_PAGE && IS_ADMIN
-  );
+  const select = document.getElementById("categoryFilter");
+  if (select) select.value = categoryId;
+
+  productFilters = { ...readProductFilters(), category_id: categoryId };
+  loadProducts();
 
-  updateResultsCount(filtered.length, true);
   updateResetButtonVisibility("mainDashboard");
   scrollWithOffset("categorySection");
 }
@@ -1137,7 +1348,7 @@ function loadDashboardCategories() {
           <i class="fa-solid fa-tag"></i>${titleCase(cat.name)}
         `;
 
-        chip.onclick = () => filterByCategory(cat.name);
+        chip.onclick = () => filterByCategory(cat.id);
 
         container.appendChild(chip);
       });
@@ -1588,17 +1799,13 @@ function loadCampaignProductsByCategory() {
     return;
   }
 
-  fetch("/api/products/")
-    .then(res => res.json())
+  fetchAllProducts({ category_id: categoryId })
     .then(products => {
 
-      const filtered =
-        products.filter(p => p.category_id === categoryId);
-
       productSelect.innerHTML =
         `<option value="">Select Product</option>`;
 
-      filtered.forEach(p => {
+      products.forEach(p => {
         productSelect.innerHTML += `
           <option value="${p._id}">
             ${p.name}
@@ -1916,83 +2123,90 @@ let newArrivalsHTMLCache = "";
 let featuredIndex = 0;
 let featuredInterval = null;
 
-function loadFeaturedProducts() {
-  fetch("/api/products/featured")
+function loadHomeFeeds() {
+  fetch("/api/products/home", { credentials: "include" })
     .then(res => res.json())
     .then(data => {
-      const container = document.getElementById("featuredProducts");
-      if (!container) return;
-
-      if (!data || data.length === 0) {
-        container.innerHTML = `
-          <div class="no-featured-message">
-            <div class="no-featured-icon">
-              <i class="fa-solid fa-gift"></i>
-            </div>
+      renderFeaturedProducts(data.featured || []);
+      renderTopProducts(data.top_selling || []);
+      renderNewArrivals(data.new_arrivals || []);
+    })
+    .catch(err => console.error("Failed to load home feeds", err));
+}
 
-            <h3>No Live Campaign Right Now</h3>
-            <p>Check out our latest products instead.</p>
+function renderFeaturedProducts(data) {
+  const container = document.getElementById("featuredProducts");
+  if (!container) return;
 
-            <button class="browse-btn" onclick="scrollWithOffset('newArrivalsSection')">
-              Browse Products
-            </button>
-          </div>
-        `;
+  if (!data || data.length === 0) {
+    container.innerHTML = `
+      <div class="no-featured-message">
+        <div class="no-featured-icon">
+          <i class="fa-solid fa-gift"></i>
+        </div>
 
-        document.querySelectorAll(".featured-arrow")
-          .forEach(a => a.style.display = "none");
-        return;
-      }
+        <h3>No Live Campaign Right Now</h3>
+        <p>Check out our latest products instead.</p>
 
-      const newHTML = data.map(p => `
-        <div class="editorial-card"
-            onclick="viewProduct('${p._id}')">
+        <button class="browse-btn" onclick="scrollWithOffset('newArrivalsSection')">
+          Browse Products
+        </button>
+      </div>
+    `;
 
-          <div class="featured-img-wrapper">
-            <img src="${p.image_url}">
+    document.querySelectorAll(".featured-arrow")
+      .forEach(a => a.style.display = "none");
+    return;
+  }
 
-            <div class="limited-badge">
-              Limited Time Offer
-            </div>
+  const newHTML = data.map(p => `
+    <div class="editorial-card"
+        onclick="viewProduct('${p._id}')">
 
-            <div class="featured-countdown"
-                data-end="${p.campaign_end}">
-              Calculating...
-            </div>
+      <div class="featured-img-wrapper">
+        <img src="${p.image_url}">
 
-          </div>
+        <div class="limited-badge">
+          Limited Time Offer
+        </div>
 
-          <div class="editorial-info">
-            <h4>${p.name}</h4>
-            <div class="category">${titleCase(p.category)}</div>
-            <div class="price">${renderPriceHTML(p)}</div>
-          </div>
+        <div class="featured-countdown"
+            data-end="${p.campaign_end}">
+          Calculating...
         </div>
-      `).join("");
 
-      if (newHTML === featuredHTMLCache) {
-        return;
-      }
-      featuredHTMLCache = newHTML;
-      container.style.opacity = "0.5";
+      </div>
 
-      setTimeout(() => {
-        container.innerHTML = newHTML;
-        container.style.opacity = "1";
+      <div class="editorial-info">
+        <h4>${p.name}</h4>
+        <div class="category">${titleCase(p.category)}</div>
+        <div class="price">${renderPriceHTML(p)}</div>
+      </div>
+    </div>
+  `).join("");
 
-        const arrows =
-          document.querySelectorAll(".featured-arrow");
+  if (newHTML === featuredHTMLCache) {
+    return;
+  }
+  featuredHTMLCache = newHTML;
+  container.style.opacity = "0.5";
 
-        if (data.length <= 4) {
-          arrows.forEach(a => a.style.display = "none");
-        } else {
-          arrows.forEach(a => a.style.display = "block");
-        }
+  setTimeout(() => {
+    container.innerHTML = newHTML;
+    container.style.opacity = "1";
 
-        startFeaturedCountdown();
-        initFeaturedCarousel();
-      }, 200);
-    });
+    const arrows =
+      document.querySelectorAll(".featured-arrow");
+
+    if (data.length <= 4) {
+      arrows.forEach(a => a.style.display = "none");
+    } else {
+      arrows.forEach(a => a.style.display = "block");
+    }
+
+    startFeaturedCountdown();
+    initFeaturedCarousel();
+  }, 200);
 }
 
 function updateFeaturedPosition() {
@@ -2126,92 +2340,84 @@ function startFeaturedCountdown() {
 }
 
 // LOAD TOP-SELLING PRODUCTS
-function loadTopProducts() {
-  fetch("/api/products/top-selling")
-    .then(res => res.json())
-    .then(data => {
+function renderTopProducts(data) {
 
-      const container = document.getElementById("topProducts");
-      if (!container) return;
+  const container = document.getElementById("topProducts");
+  if (!container) return;
 
-      const newHTML = data.map((p, index) => {
+  const newHTML = data.map((p, index) => {
 
-        let badge = "";
-        if (index === 0) {
-          badge = `<div class="top-badge gold">
-                    <i class="fa-solid fa-trophy" style="color: rgb(255, 212, 59);"></i> Best Seller</div>`;
-        }
-        else if (index === 1) {
-          badge = `<div class="top-badge silver">
-                    <i class="fa-solid fa-star" style="color: rgb(255, 212, 59);"></i> Popular Pick</div>`;
-        }
-        else if (index === 2) {
-          badge = `<div class="top-badge bronze">
-                    <i class="fa-solid fa-fire" style="color: rgb(255, 212, 59);"></i> Customer Favorite</div>`;
-        }
+    let badge = "";
+    if (index === 0) {
+      badge = `<div class="top-badge gold">
+                <i class="fa-solid fa-trophy" style="color: rgb(255, 212, 59);"></i> Best Seller</div>`;
+    }
+    else if (index === 1) {
+      badge = `<div class="top-badge silver">
+                <i class="fa-solid fa-star" style="color: rgb(255, 212, 59);"></i> Popular Pick</div>`;
+    }
+    else if (index === 2) {
+      badge = `<div class="top-badge bronze">
+                <i class="fa-solid fa-fire" style="color: rgb(255, 212, 59);"></i> Customer Favorite</div>`;
+    }
 
-        return `
-        <div class="mini-card ${p.quantity === 0 ? 'sold-out' : ''}"
-             data-product-id="${p._id}"
-             onclick="${p.quantity === 0 ? '' : `viewProduct('${p._id}')`}">
+    return `
+    <div class="mini-card ${p.quantity === 0 ? 'sold-out' : ''}"
+         data-product-id="${p._id}"
+         onclick="${p.quantity === 0 ? '' : `viewProduct('${p._id}')`}">
 
-          <div class="mini-img-wrapper">
-            ${badge}
-            <img src="${p.image_url || p.images?.[0]}">
+      <div class="mini-img-wrapper">
+        ${badge}
+        <img src="${p.image_url || p.images?.[0]}">
 
-            ${p.quantity === 0
-              ? `<div class="stock-overlay">Out Of Stock</div>`
-              : ``}
-          </div>
+        ${p.quantity === 0
+          ? `<div class="stock-overlay">Out Of Stock</div>`
+          : ``}
+      </div>
 
-          <div class="mini-info">
-            <div>${p.name}</div>
-            <div class="category">${titleCase(p.category)}</div>
+      <div class="mini-info">
+        <div>${p.name}</div>
+        <div class="category">${titleCase(p.category)}</div>
 
-            <div class="price" id="top-price-${p._id}">
-              ${renderPriceHTML(p)}
-            </div>
-          </div>
+        <div class="price" id="top-price-${p._id}">
+          ${renderPriceHTML(p)}
         </div>
-        `;
+      </div>
+    </div>
+    `;
 
-      }).join("");
+  }).join("");
 
-      if (newHTML === topProductsHTMLCache) {
-        return;
-      }
+  if (newHTML === topProductsHTMLCache) {
+    return;
+  }
 
-      topProductsHTMLCache = newHTML;
-      container.innerHTML = newHTML;
-    });
+  topProductsHTMLCache = newHTML;
+  container.innerHTML = newHTML;
 }
 
-// LOAD NEW-ARRIVAL PRODUCTS
-function loadNewArrivals() {
-  fetch("/api/products/new-arrivals")
-    .then(res => res.json())
-    .then(data => {
-      const container = document.getElementById("newProducts");
-      if (!container) return;
+// RENDER NEW-ARRIVAL PRODUCTS
+function renderNewArrivals(data) {
+  const container = document.getElementById("newProducts");
+  if (!container) return;
 
-      container.innerHTML = data.map(p => `
-        <div class="editorial-card"
-             onclick="viewProduct('${p._id}')">
-          <img src="${p.image_url || p.images?.[0]}" />
-          <div class="editorial-info">
-            <h4>${p.name}</h4>
-            <div class="category">${titleCase(p.category)}</div>
-            <div class="category">${p.description}</div>
-            <div class="price">${renderPriceHTML(p)}</div>
-          </div>
-        </div>
-      `).join("");
+  const newHTML = data.map(p => `
+    <div class="editorial-card"
+         onclick="viewProduct('${p._id}')">
+      <img src="${p.image_url || p.images?.[0]}" />
+      <div class="editorial-info">
+        <h4>${p.name}</h4>
+        <div class="category">${titleCase(p.category)}</div>
+        <div class="category">${p.description}</div>
+        <div class="price">${renderPriceHTML(p)}</div>
+      </div>
+    </div>
+  `).join("");
 
-      if (newHTML === topProductsHTMLCache) return;
+  if (newHTML === newArrivalsHTMLCache) return;
 
-      topProductsHTMLCache = newHTML;
-      container.innerHTML = newHTML;
-    });
+  newArrivalsHTMLCache = newHTML;
+  container.innerHTML = newHTML;
 }
 
 function scrollNewArrivals(direction) {
@@ -2278,29 +2484,9 @@ document.addEventListener("DOMContentLoaded", () => {
   }
 
   if (location.pathname === "/dashboard") {
-    loadFeaturedProducts();
-    loadTopProducts();
-    loadNewArrivals();
+    loadHomeFeeds();
 
-    setInterval(() => {
-      loadTopProducts();
-      loadNewArrivals();
-      loadFeaturedProducts();
-    }, 10000);
-
-    setInterval(async () => {
-      try {
-        const res = await fetch("/api/products/");
-        const data = await res.json();
-
-        syncCampaignPrices(data);
-
-        productCache = data;
-
-      } catch (err) {
-        console.error("Live price sync failed:", err);
-      }
-    }, 10000);
+    startPriceStream();
   }
 
   if (location.pathname !== "/wishlist") {
@@ -22,55 +22,22 @@ function loadCart() {
       itemsDiv.style.display = "flex";
       summaryDiv.style.display = "block";
 
-      let subtotal = 0;
-      let campaignDiscount = 0;
-      let membershipDiscount = 0;
-      let membershipPercent = 0;
-      let campaignPercent = 0;
-      let totalAmount = 0;
-      let shippingCost = data.shipping_cost ?? 1000;
-      let originalShippingCost = data.original_shipping_cost ?? shippingCost;
-      let discountBreakdown = [];
+      // totals are computed server-side
+      const subtotal = data.subtotal;
+      const totalDiscount = data.savings;
+      const shippingCost = data.shipping_cost;
+      const originalShippingCost = data.original_shipping_cost;
+      const grandTotal = data.grand_total;
+
+      const discountBreakdown = data.items.map(item => ({
+        name: item.name,
+        campaign: item.campaign_saved,
+        membership: item.membership_saved,
+        campaignPercent: item.discount_percent || 0,
+        membershipPercent: item.member_discount || 0
+      }));
 
       itemsDiv.innerHTML = data.items.map(item => {
-        const basePrice = item.original_price || item.price;
-        const campaignPrice = item.offer_price || basePrice;
-        const finalPrice = item.final_price || campaignPrice;
-
-        const itemSubtotal = basePrice * item.qty;
-
-        const campaignSaved =
-          item.discount_percent
-            ? (basePrice - campaignPrice) * item.qty
-            : 0;
-
-        const membershipSaved =
-          item.member_discount
-            ? (campaignPrice - finalPrice) * item.qty
-            : 0;
-
-        subtotal += itemSubtotal;
-        totalAmount += finalPrice * item.qty;
-
-        campaignDiscount += campaignSaved;
-        membershipDiscount += membershipSaved;
-
-        discountBreakdown.push({
-          name: item.name,
-          campaign: campaignSaved,
-          membership: membershipSaved,
-          campaignPercent: item.discount_percent || 0,
-          membershipPercent: item.member_discount || 0
-        });
-
-        if (item.member_discount) {
-          membershipPercent = item.member_discount;
-        }
-
-        if (item.discount_percent) {
-          campaignPercent = item.discount_percent;
-        }
-
         const stock = item.stock ?? 9999;
         const prevQty = lastQtyMap[item.product_id];
         const animate = prevQty !== undefined && prevQty !== item.qty;
@@ -115,8 +82,6 @@ function loadCart() {
         `;
       }).join("");
 
-      const totalDiscount = campaignDiscount + membershipDiscount;
-
       summaryDiv.innerHTML = `
       <h3>Cart Summary</h3>
       ${data.items.map(item => {
@@ -165,7 +130,7 @@ function loadCart() {
       <hr>
       <div class="cart-summary-total">
         <span>Total (Including Shipping)</span>
-        <span>₹ ${(totalAmount + shippingCost).toLocaleString("en-IN")}</span>
+        <span>₹ ${grandTotal.toLocaleString("en-IN")}</span>
       </div>
 
       ${
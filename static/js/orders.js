@@ -1,12 +1,11 @@
 let cachedOrders = [];
-let lastUserOrderUpdate = null;
 
 document.addEventListener("DOMContentLoaded", () => {
   const container = document.getElementById("ordersContainer");
   if (!container) return;
 
   loadOrders(container);
-  setInterval(checkUserOrderChanges, 5000);
+  startUserOrderStream(container);
 });
 
 function loadOrders(container) {
@@ -149,6 +148,17 @@ function renderOrders(container, orders) {
               `
               : ""
           }
+
+          ${
+            order.status === "Delivered"
+              ? `
+                <button class="dashboard-btn"
+                  onclick="buyAgain('${order.id}')">
+                  Buy Again
+                </button>
+              `
+              : ""
+          }
         </div>
 
       </div>
@@ -177,27 +187,66 @@ function cancelOrder(orderId) {
   );
 }
 
-function checkUserOrderChanges() {
-  fetch("/api/orders/user-last-update", { credentials: "include" })
-    .then(res => res.json())
-    .then(data => {
+async function buyAgain(orderId) {
+  const order = cachedOrders.find(o => o.id === orderId);
+  if (!order) return;
+
+  const res = await fetch("/api/cart/batch", {
+    method: "POST",
+    credentials: "include",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      operations: order.items.map(item => ({
+        op: "add",
+        product_id: item.product_id,
+        qty: item.qty
+      }))
+    })
+  });
 
-      if (!lastUserOrderUpdate) {
-        lastUserOrderUpdate = data.last_update;
-        return;
-      }
+  if (!res.ok) {
+    const data = await res.json().catch(() => ({}));
+    showToast(data.error === "Out of stock"
+      ? "Some Items Are Out Of Stock"
+      : "Failed To Add Items To Cart", "error");
+    return;
+  }
 
-      if (data.last_update !== lastUserOrderUpdate) {
-        lastUserOrderUpdate = data.last_update;
+  showToast("Items Added To Your Cart Successfully.", "success");
+  updateCartCount();
+}
 
-        const container = document.getElementById("ordersContainer");
-        if (container) {
-          loadOrders(container);
-          showToast("Order Status Updated", "info");
-        }
-      }
-    })
-    .catch(() => {});
+function startUserOrderStream(container) {
+  if (!window.EventSource) return;
+
+  const source = new EventSource("/api/orders/my-stream");
+  let connected = false;
+
+  // events sent while the stream was down are not replayed, so a
+  // reconnect reloads the list instead
+  source.onopen = () => {
+    if (connected) loadOrders(container);
+    connected = true;
+  };
+
+  source.addEventListener("order", event => {
+    const { order } = JSON.parse(event.data);
+
+    cachedOrders = cachedOrders.filter(o => o.id !== order.id);
+
+    if (order.status !== "Cancelled") {
+      cachedOrders = sortOrdersForUser([...cachedOrders, order]);
+    }
+
+    if (document.getElementById("orderStatusFilter")) {
+      filterOrdersByStatus();
+    } else {
+      renderOrders(container, cachedOrders);
+      updateOrderCount(cachedOrders);
+    }
+
+    showToast("Order Status Updated", "info");
+  });
 }
 
 function getStatusClass(status) {
@@ -1,5 +1,67 @@
-from functools import wraps
-from flask import session, jsonify
+from functools import wraps, cached_property
+from flask import session, jsonify, g
+from bson.objectid import ObjectId
+from datetime import datetime
+from extension import mongo
+
+class UserContext:
+    def __init__(self, user_id):
+        self.user_id = ObjectId(user_id) if user_id else None
+
+    @cached_property
+    def user(self):
+        if not self.user_id:
+            return None
+
+        return mongo.db.users.find_one(
+            {"_id": self.user_id},
+            {"password": 0}
+        )
+
+    @cached_property
+    def membership(self):
+        user = self.user or {}
+        return user.get("membership") or {}
+
+    @cached_property
+    def membership_active(self):
+        expiry = self.membership.get("expires_at")
+        return bool(expiry and expiry > datetime.utcnow())
+
+    @cached_property
+    def membership_plan(self):
+        return self.membership.get("plan") if self.membership_active else None
+
+    @cached_property
+    def membership_tier(self):
+        return self.membership_plan or "free"
+
+    @cached_property
+    def member_discount(self):
+        if not self.membership_active:
+            return 0
+
+        return float(self.membership.get("discount", 0))
+
+    @cached_property
+    def early_campaign_hours(self):
+        if not self.membership_active:
+            return 0
+
+        return self.membership.get("early_campaign_hours", 0)
+
+    @cached_property
+    def free_shipping(self):
+        return self.membership_active and bool(self.membership.get("free_shipping"))
+
+def get_user_context():
+    context = g.get("user_context")
+
+    if context is None:
+        context = UserContext(session.get("user_id"))
+        g.user_context = context
+
+    return context
 
 def login_user(user):
     session["user_id"] = str(user["_id"])
@@ -20,6 +82,8 @@ def login_required(role=None):
             if role and session.get("role") != role:
                 return jsonify({"message": "Access denied"}), 403
 
+            get_user_context()
+
             return fn(*args, **kwargs)
 
         return wrapper